@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+"Benchmark pkglog parsers and complete runs on synthetic logs."
+
+# Each parser is timed alone on log lines already read into memory, and
+# then complete runs of pkglog over the same logs are timed. Each is run
+# in a child process so its peak memory can be reported. Results can be
+# saved as a JSON baseline, and later compared to catch regressions.
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import SUPPRESS, ArgumentParser, Namespace
+from collections.abc import Iterator
+from pathlib import Path
+
+from genlogs import GENERATORS, generate
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def read_lines(path: Path) -> Iterator[str]:
+    "Yield all lines from log file, or directory of rotated log files"
+    import fileinput
+
+    files = sorted(path.iterdir(), reverse=True) if path.is_dir() else [path]
+    for file in files:
+        with fileinput.hook_compressed(str(file), 'r', encoding='unicode_escape') as fp:
+            yield from fp
+
+
+def child(stage: str, parser: str, path: Path, repeat: int) -> None:
+    "Run given stage in this child process, and print result as JSON"
+    sys.path.insert(0, str(ROOT))
+    from pkglog import pkglog
+
+    best = float('inf')
+    if stage == 'parse':
+        module = pkglog.Module(pkglog.MODDIR / 'parsers' / f'{parser}.py')
+        lines = list(read_lines(path))
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in pkglog.get_events(lines, module.module.Parser()):
+                pass
+            best = min(best, time.perf_counter() - start)
+        count = len(lines)
+    else:
+        count = sum(1 for _ in read_lines(path))
+        sys.argv = ['pkglog', '-p', parser, '-P', str(path), '-a']
+        with open(os.devnull, 'w') as sys.stdout:
+            start = time.perf_counter()
+            pkglog.main()
+            best = time.perf_counter() - start
+
+        sys.stdout = sys.__stdout__
+
+    print(json.dumps({'lines': count, 'secs': best}))
+
+
+def run(stage: str, parser: str, path: Path, repeat: int) -> dict | None:
+    "Run given stage in child processes, return best result and peak memory"
+    # Ensure user default options and cache do not affect the results
+    env = dict(os.environ, XDG_CONFIG_HOME=os.devnull, XDG_CACHE_HOME=os.devnull)
+
+    # The parser stage repeats in one process, but each complete run is
+    # in a fresh process so that no state or caches are carried over
+    runs, repeat = (1, repeat) if stage == 'parse' else (repeat, 1)
+    cmd = [sys.executable, __file__, '--child', stage, parser, str(path), str(repeat)]
+    results = []
+    for _ in range(runs):
+        with tempfile.TemporaryFile() as err:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, env=env)
+            out = proc.stdout.read()  # type: ignore
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            if proc.returncode:
+                err.seek(0)
+                msg = err.read().decode().strip().splitlines()
+                print(f'{parser} {stage} failed: {msg[-1:]}', file=sys.stderr)
+                return None
+
+        result = json.loads(out)
+        result['peak_mb'] = usage.ru_maxrss / 1024
+        results.append(result)
+
+    result = min(results, key=lambda r: r['secs'])
+    result['lines_per_sec'] = result['lines'] / result['secs']
+    result['peak_mb'] = min(r['peak_mb'] for r in results)
+    return result
+
+
+def change(value: float, base: float | None) -> float | None:
+    "Return percentage change of value from baseline value"
+    return (value - base) / base * 100 if base else None
+
+
+def bench(args: Namespace) -> int:
+    "Run benchmarks, return number of regressions from baseline"
+    outdir = Path(args.dir or Path(tempfile.gettempdir(), 'pkglog-bench'))
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else {}
+    results: dict[str, dict] = {}
+    regressions = 0
+
+    print(
+        f'{"parser":8} {"stage":6} {"lines":>9} {"secs":>8} {"lines/s":>10} '
+        f'{"peak MB":>8} {"vs base":>8} {"mem vs":>8}'
+    )
+    for parser in args.parser or GENERATORS:
+        if parser not in GENERATORS:
+            sys.exit(f'ERROR: unknown parser {parser}')
+
+        path = generate(outdir, parser, args.lines, args.seed)
+        for stage in ('parse', 'main'):
+            if not (result := run(stage, parser, path, args.repeat)):
+                regressions += 1
+                continue
+
+            results.setdefault(parser, {})[stage] = result
+            base = baseline.get('results', {}).get(parser, {}).get(stage, {})
+            speed = change(result['lines_per_sec'], base.get('lines_per_sec'))
+            mem = change(result['peak_mb'], base.get('peak_mb'))
+            flag = ''
+            if speed is not None and mem is not None:
+                if speed < -args.threshold or mem > args.threshold:
+                    regressions += 1
+                    flag = ' REGRESSION'
+
+            speedstr = '' if speed is None else f'{speed:+.1f}%'
+            memstr = '' if mem is None else f'{mem:+.1f}%'
+            print(
+                f'{parser:8} {stage:6} {result["lines"]:9} {result["secs"]:8.3f} '
+                f'{result["lines_per_sec"]:10.0f} {result["peak_mb"]:8.1f} '
+                f'{speedstr:>8} {memstr:>8}{flag}',
+                flush=True,
+            )
+
+    if baseline and baseline.get('lines') != args.lines:
+        print(f'Warning: baseline was for {baseline.get("lines")} lines per log')
+
+    if args.save:
+        python = sys.version.split()[0]
+        data = {'lines': args.lines, 'python': python, 'results': results}
+        Path(args.save).write_text(json.dumps(data, indent=2) + '\n')
+
+    return regressions
+
+
+def main() -> None:
+    opt = ArgumentParser(description=__doc__)
+    opt.add_argument(
+        '-n', '--lines', type=int, default=100000, help='lines per log, default=100000'
+    )
+    opt.add_argument(
+        '-d', '--dir', help='directory to write logs to, default=$TMPDIR/pkglog-bench'
+    )
+    opt.add_argument('-S', '--seed', type=int, default=1, help='random seed for logs')
+    opt.add_argument(
+        '-r', '--repeat', type=int, default=3, help='best of this many runs, default=3'
+    )
+    opt.add_argument('-s', '--save', help='save results to given JSON file')
+    opt.add_argument('-b', '--baseline', help='compare results to given JSON file')
+    opt.add_argument(
+        '-t',
+        '--threshold',
+        type=float,
+        default=10,
+        help='percentage worse than baseline to report as regression, default=10',
+    )
+    opt.add_argument('--child', nargs=4, help=SUPPRESS)
+    opt.add_argument('parser', nargs='*', help='parser[s] to benchmark, default=all')
+    args = opt.parse_args()
+
+    if args.child:
+        stage, parser, path, repeat = args.child
+        child(stage, parser, Path(path), int(repeat))
+        return
+
+    if regressions := bench(args):
+        sys.exit(f'{regressions} regression[s] or failure[s].')
+
+
+if __name__ == '__main__':
+    main()
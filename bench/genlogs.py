@@ -0,0 +1,317 @@
+#!/usr/bin/python3
+"Generate deterministic synthetic package logs for each parser."
+
+from __future__ import annotations
+
+import gzip
+import random
+import sys
+from argparse import ArgumentParser
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TextIO
+
+# Log path for each parser, relative to the output directory
+LOGS = {
+    'apt': 'apt',
+    'dnf': 'dnf.rpm.log',
+    'pacman': 'pacman.log',
+    'xbps': 'xbps.log',
+    'zypper': 'zypper.log',
+}
+
+START = datetime(2016, 1, 1)
+SPAN = timedelta(days=8 * 365)
+
+# Number of gzipped apt log rotations, in addition to history.log[.1]
+APT_ROTATIONS = 4
+
+PREFIXES = ('', '', '', 'lib', 'lib', 'python-', 'perl-', 'qt6-', 'kf6-', 'gst-')
+SYLLABLES = (
+    'ba be bi bo bu da de di do ka ke ko la le li lo ma mo na ne ni no '
+    'ra re ro sa se so ta te to va ve vo xa ze zo'
+).split()
+SUFFIXES = ('', '', '', '', '-utils', '-data', '-devel', '-common', '-plugins')
+
+# Relative frequency of each action within a transaction
+ACTIONS = {
+    'upgraded': 60,
+    'installed': 20,
+    'removed': 12,
+    'reinstalled': 5,
+    'downgraded': 3,
+}
+
+Change = tuple[str, str, str, str]  # action, package, old version, new version
+
+
+class Simulator:
+    "Simulate a history of transactions on a set of packages"
+
+    def __init__(self, lines: int, seed: int, per: int, sep: str = '-') -> None:
+        self.rng = rng = random.Random(seed)
+        self.sep = sep
+        self.names = sorted(
+            {
+                rng.choice(PREFIXES)
+                + ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                + rng.choice(SUFFIXES)
+                for _ in range(3000)
+            }
+        )
+        self.actions = list(ACTIONS)
+        self.weights = list(ACTIONS.values())
+        self.installed: dict[str, list[int]] = {}
+        for name in rng.sample(self.names, len(self.names) // 2):
+            self.installed[name] = self.new_version()
+
+        # Average time between transactions, given approximate lines per
+        # transaction, so that all lines fit in SPAN
+        self.gap = SPAN.total_seconds() * per / max(lines, 1)
+
+    def new_version(self) -> list[int]:
+        rng = self.rng
+        return [rng.randint(0, 9), rng.randint(0, 30), rng.randint(0, 9), 1]
+
+    def version(self, vers: list[int]) -> str:
+        return f'{vers[0]}.{vers[1]}.{vers[2]}{self.sep}{vers[3]}'
+
+    def change(self, exclude: set[str]) -> Change:
+        "Return a random change to the installed packages, not in exclude"
+        rng = self.rng
+        action = rng.choices(self.actions, self.weights)[0]
+        if action == 'installed' or not self.installed:
+            name = rng.choice(self.names)
+            if name in self.installed or name in exclude:
+                return self.change(exclude)
+            vers = self.installed[name] = self.new_version()
+            return 'installed', name, '', self.version(vers)
+
+        name = rng.choice(list(self.installed))
+        if name in exclude:
+            return self.change(exclude)
+
+        vers = self.installed[name]
+        old = self.version(vers)
+        if action == 'removed':
+            del self.installed[name]
+            return action, name, old, ''
+
+        if action == 'upgraded':
+            if rng.random() < 0.7:
+                vers[3] += 1
+            else:
+                vers[2] += 1
+                vers[3] = 1
+        elif action == 'downgraded':
+            if vers[3] == 1:
+                return self.change(exclude)
+            vers[3] -= 1
+
+        return action, name, old, self.version(vers)
+
+    def transactions(self) -> Iterator[tuple[datetime, list[Change]]]:
+        "Yield time and list of changes for each transaction"
+        rng = self.rng
+        dt = START
+        while True:
+            dt += timedelta(seconds=int(rng.expovariate(1 / self.gap)) + 1)
+            changes: list[Change] = []
+            names: set[str] = set()
+            for _ in range(min(int(rng.paretovariate(1.2)), 200)):
+                changes.append(change := self.change(names))
+                names.add(change[1])
+
+            yield dt, changes
+
+
+class Output:
+    "Write lines to a log file, counting them"
+
+    def __init__(self, fp: TextIO) -> None:
+        self.fp = fp
+        self.count = 0
+
+    def write(self, *lines: str) -> None:
+        self.fp.write('\n'.join(lines) + '\n')
+        self.count += len(lines)
+
+
+def pacman(path: Path, lines: int, seed: int) -> None:
+    sim = Simulator(lines, seed, 11)
+    with path.open('w') as fp:
+        out = Output(fp)
+        for dt, changes in sim.transactions():
+            if out.count >= lines:
+                break
+
+            ts = f'[{dt:%Y-%m-%dT%H:%M:%S}+1000]'
+            out.write(
+                f"{ts} [PACMAN] Running 'pacman -Syu'",
+                f'{ts} [PACMAN] synchronizing package lists',
+                f'{ts} [PACMAN] starting full system upgrade',
+                f'{ts} [ALPM] transaction started',
+            )
+            for action, name, old, new in changes:
+                dt += timedelta(seconds=sim.rng.randint(0, 2))
+                ts = f'[{dt:%Y-%m-%dT%H:%M:%S}+1000]'
+                if action in ('upgraded', 'downgraded'):
+                    out.write(f'{ts} [ALPM] {action} {name} ({old} -> {new})')
+                else:
+                    out.write(f'{ts} [ALPM] {action} {name} ({old or new})')
+                if sim.rng.random() < 0.05:
+                    out.write(f'{ts} [ALPM-SCRIPTLET] ==> Updating {name} cache')
+
+            out.write(
+                f'{ts} [ALPM] transaction completed',
+                f"{ts} [ALPM] running '30-systemd-update.hook'...",
+                f"{ts} [ALPM] running 'update-desktop-database.hook'...",
+            )
+
+
+def apt(path: Path, lines: int, seed: int) -> None:
+    sim = Simulator(lines, seed, 6)
+    path.mkdir(parents=True, exist_ok=True)
+    for old in path.glob('history.log*'):
+        old.unlink()
+
+    # Write oldest rotated file first, moving to the next at each chunk
+    names = [f'history.log.{n}.gz' for n in range(APT_ROTATIONS + 1, 1, -1)]
+    names += ['history.log.1', 'history.log']
+    chunk = lines // len(names) + 1
+    keys = {
+        'installed': 'Install',
+        'upgraded': 'Upgrade',
+        'removed': 'Remove',
+        'reinstalled': 'Reinstall',
+        'downgraded': 'Downgrade',
+    }
+    transactions = sim.transactions()
+    total = 0
+    for name in names:
+        file = path / name
+        with gzip.open(file, 'wt') if name.endswith('.gz') else file.open('w') as fp:
+            out = Output(fp)
+            while out.count < chunk and total + out.count < lines:
+                dt, changes = next(transactions)
+                kinds: dict[str, list[str]] = {}
+                for action, pkg, old, new in changes:
+                    if action in ('upgraded', 'downgraded'):
+                        vers = f'{old}, {new}'
+                    elif action == 'installed' and sim.rng.random() < 0.3:
+                        vers = f'{new}, automatic'
+                    else:
+                        vers = old or new
+                    kinds.setdefault(keys[action], []).append(f'{pkg}:amd64 ({vers})')
+
+                end = dt + timedelta(seconds=len(changes))
+                out.write(
+                    f'Start-Date: {dt:%Y-%m-%d  %H:%M:%S}',
+                    'Commandline: apt-get -y dist-upgrade',
+                    'Requested-By: user (1000)',
+                    *(f'{k}: {", ".join(v)}' for k, v in kinds.items()),
+                    f'End-Date: {end:%Y-%m-%d  %H:%M:%S}',
+                    '',
+                )
+            total += out.count
+
+
+def dnf(path: Path, lines: int, seed: int) -> None:
+    sim = Simulator(lines, seed, 7)
+    keys = {
+        'installed': ('Installed',),
+        'upgraded': ('Upgrade', 'Upgraded'),
+        'removed': ('Erase',),
+        'reinstalled': ('Reinstall', 'Reinstalled'),
+        'downgraded': ('Downgrade', 'Downgraded'),
+    }
+    with path.open('w') as fp:
+        out = Output(fp)
+        for dt, changes in sim.transactions():
+            if out.count >= lines:
+                break
+
+            ts = f'{dt:%Y-%m-%dT%H:%M:%S}+0000'
+            out.write(f'{ts} INFO --- logging initialized ---')
+            for action, name, old, new in changes:
+                for key, vers in zip(keys[action], (new or old, old)):
+                    out.write(f'{ts} SUBDEBUG {key}: {name}-{vers}.fc39.x86_64')
+
+
+def xbps(path: Path, lines: int, seed: int) -> None:
+    sim = Simulator(lines, seed, 6, '_')
+    with path.open('w') as fp:
+        out = Output(fp)
+        for dt, changes in sim.transactions():
+            if out.count >= lines:
+                break
+
+            pre = f'{dt:%Y-%m-%dT%H:%M:%S}.{sim.rng.randint(0, 99999):05}'
+            pre += f' user.notice: {dt:%b %e %H:%M:%S} xbps-install:'
+            tail = 'successfully (rootdir: /).'
+            for action, name, old, new in changes:
+                if action == 'upgraded':
+                    out.write(
+                        f'{pre} {name}-{old}: updating to {new} ...',
+                        f"{pre} Updated `{name}-{new}' {tail}",
+                    )
+                elif action == 'removed':
+                    out.write(f"{pre} Removed `{name}-{old}' {tail}")
+                else:
+                    out.write(f"{pre} Installed `{name}-{new}' {tail}")
+
+
+def zypper(path: Path, lines: int, seed: int) -> None:
+    sim = Simulator(lines, seed, 6)
+    with path.open('w') as fp:
+        out = Output(fp)
+        for dt, changes in sim.transactions():
+            if out.count >= lines:
+                break
+
+            ts = f'{dt:%Y-%m-%d %H:%M:%S}'
+            out.write(f'# {ts} zypper up', f"{ts}|command|root@host|'zypper' 'up'|")
+            for action, name, old, new in changes:
+                if action == 'removed':
+                    out.write(f'{ts}|remove|{name}|{old}|x86_64|root@host|')
+                else:
+                    sha = f'{sim.rng.getrandbits(128):032x}'
+                    out.write(f'{ts}|install|{name}|{new}|x86_64||repo-oss|{sha}|')
+
+
+GENERATORS = {'apt': apt, 'dnf': dnf, 'pacman': pacman, 'xbps': xbps, 'zypper': zypper}
+
+
+def generate(outdir: Path, parser: str, lines: int, seed: int = 1) -> Path:
+    "Generate log for given parser, if not already done. Return its path."
+    path = outdir / LOGS[parser]
+    stamp = outdir / f'.{parser}-{lines}-{seed}'
+    if not stamp.exists():
+        outdir.mkdir(parents=True, exist_ok=True)
+        for old in outdir.glob(f'.{parser}-*'):
+            old.unlink()
+        GENERATORS[parser](path, lines, seed)
+        stamp.touch()
+
+    return path
+
+
+def main() -> None:
+    opt = ArgumentParser(description=__doc__)
+    opt.add_argument(
+        '-n', '--lines', type=int, default=100000, help='lines per log, default=100000'
+    )
+    opt.add_argument('-s', '--seed', type=int, default=1, help='random seed, default=1')
+    opt.add_argument('outdir', help='directory to write logs to')
+    opt.add_argument('parser', nargs='*', help='parser[s] to write logs for')
+    args = opt.parse_args()
+
+    for parser in args.parser or GENERATORS:
+        if parser not in GENERATORS:
+            sys.exit(f'ERROR: unknown parser {parser}')
+        print(generate(Path(args.outdir), parser, args.lines, args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"Reports concise log of package changes."
+
+from __future__ import annotations
+
+from .pkglog import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .api import (
+        Event,
+        Log,
+        installed_at,
+        installed_net,
+        iter_events,
+        iter_transactions,
+    )
+
+__all__ = [
+    'Event',
+    'Log',
+    'installed_at',
+    'installed_net',
+    'iter_events',
+    'iter_transactions',
+]
+
+
+def __getattr__(name: str):
+    # Import the library API only on first use, since the command line
+    # does not need it
+    if name in __all__:
+        from . import api
+
+        return getattr(api, name)
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,279 @@
+"Library interface to read package changes from logs, without the command line."
+
+from __future__ import annotations
+
+from collections import namedtuple
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from . import pkglog
+from .pkglog import (
+    NETDAYS,
+    TIMEGAP,
+    TYPE_CHECKING,
+    Events,
+    Module,
+    compile_prefilter,
+    compile_select,
+    find_modules,
+    get_files,
+    get_scan,
+    open_cache,
+    read_events,
+    read_installed,
+)
+
+if TYPE_CHECKING:
+    from typing import NamedTuple
+
+    class Event(NamedTuple):
+        time: datetime
+        action: str
+        package: str
+        version: str  # "old -> new" for upgrades and downgrades
+
+else:
+    # Typed as above, but typing is slow to import for the command line
+    Event = namedtuple('Event', ('time', 'action', 'package', 'version'))
+    Event.__doc__ = 'Package change, or just the time of a log line if action is empty'
+
+
+def get_module(parser: str | Path | Module | None = None) -> Module:
+    "Return parser module of given name or plugin path, else the default"
+    if isinstance(parser, Module):
+        return parser
+
+    if parser is not None and str(parser).lower().endswith('.py'):
+        if not (path := Path(parser)).is_file():
+            raise FileNotFoundError(f'Parser plugin "{path}" does not exist')
+        return Module(path)
+
+    modules, default = find_modules()
+    if not (name := str(parser or default)):
+        raise ValueError('Can not determine log parser for this system')
+    if name not in modules:
+        raise ValueError(f'Unknown log parser "{name}"')
+
+    return modules[name]
+
+
+class Log:
+    "Package log files read by one parser, which can be queried many times"
+
+    def __init__(
+        self,
+        paths: Iterable[str | Path] | str | Path | None = None,
+        parser: str | Path | Module | None = None,
+        cache: bool = False,
+        jobs: int = 1,
+    ) -> None:
+        # Paths are log files or directories of rotated log files, which
+        # default to the parser's own log
+        self.module = get_module(parser)
+        logfile = Path(self.module.module.logfile)
+        if paths is None:
+            paths = [logfile.parent]
+        elif isinstance(paths, (str, Path)):
+            paths = [paths]
+
+        self.paths = [Path(p) for p in paths]
+        self.logname = logfile.name
+        self.jobs = jobs
+
+        # Cached events are kept in memory between queries
+        self.cache = open_cache(self.module, self.paths) if cache else None
+        if self.cache and pkglog.stats:
+            cache_events = pkglog.stats.timer('cache', self.cache.events)
+            self.cache.events = cache_events
+
+    def files(self) -> list[Path]:
+        "Return all current log files, oldest first"
+        return get_files(self.paths, self.logname)
+
+    def events(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        packages: Iterable[str] = (),
+        actions: Iterable[str] = (),
+        *,
+        glob: bool = False,
+        regex: bool = False,
+        ticks: bool = False,
+        timegap: timedelta | None = None,
+        follow: Callable | None = None,
+    ) -> Iterator[Event]:
+        "Yield selected changes in time order, and also other times if ticks"
+        # Packages are names, else glob or regex patterns. No packages, or
+        # no actions, selects all. With ticks, an event with empty action
+        # is also yielded for each other timed line and unselected change,
+        # as these still determine how changes are grouped. Given the
+        # timegap changes will be grouped by, only the ticks needed for
+        # that are yielded, so other lines need not all be parsed. Follow
+        # is only for the command line.
+        stats = pkglog.stats
+        packages = list(packages)
+        actions = list(actions)
+        start = since or datetime.min
+
+        # Cached events must be complete so can not be prefiltered, nor can
+        # lines if the time of every line is wanted
+        prefilter = scan = None
+        if packages and not self.cache and not (ticks and timegap is None):
+            prefilter = compile_prefilter(self.module, packages, glob, regex)
+
+            # Uncompressed logs are searched for lines which may match
+            if prefilter:
+                scan = get_scan(self.module, packages, glob, regex)
+
+        select = compile_select(packages, actions, glob, regex)
+        if select and stats:
+            # Count why changes are not selected by comparing with selecting
+            # on action alone
+            select = stats.select(select, compile_select((), actions))
+
+        events = read_events(
+            self.files(),
+            self.module,
+            start,
+            prefilter,
+            self.cache,
+            self.jobs,
+            follow,
+            scan,
+            timegap if ticks else None,
+        )
+        if stats:
+            events = stats.events(events)
+
+        make = Event._make
+        for event in events:
+            dt, action, pkg, _ = event
+            if dt < start:
+                if stats and action:
+                    stats.before_start(dt)
+                continue
+
+            if until and dt > until:
+                break
+
+            if action and (not select or select(action, pkg)):
+                yield make(event)
+            elif ticks:
+                yield make((dt, '', '', ''))
+
+    def installed_net(
+        self,
+        days: float = NETDAYS,
+        since: datetime | None = None,
+        packages: Iterable[str] = (),
+        *,
+        glob: bool = False,
+        regex: bool = False,
+    ) -> Iterator[Event]:
+        "Yield install of each package still installed, from since, in time order"
+        # Packages removed within days before being installed again are not
+        # considered newly installed
+        packages = list(packages)
+        actions = ('installed', 'removed')
+        if not self.cache or since and since > datetime.min:
+            events = self.events(since, None, packages, actions, glob=glob, regex=regex)
+            yield from installed_net(events, days)
+            return
+
+        # State over all time is replayed from the cached checkpoints
+        state = read_installed(self.files(), self.module, self.cache, datetime.max, 1)
+        select = compile_select(packages, actions, glob, regex)
+        installed = state.prune(select).installed_net(timedelta(days=days))
+        yield from map(Event._make, installed)
+
+    def installed_at(
+        self,
+        until: datetime | None = None,
+        packages: Iterable[str] = (),
+        *,
+        glob: bool = False,
+        regex: bool = False,
+    ) -> list[Event]:
+        "Return install of each package installed at given time, with its version"
+        state = read_installed(
+            self.files(), self.module, self.cache, until or datetime.max, self.jobs
+        )
+        select = compile_select(packages, (), glob, regex)
+        return [
+            Event._make(e)
+            for e in state.installed_at()
+            if not select or select(e[1], e[2])
+        ]
+
+
+def iter_events(
+    paths: Iterable[str | Path] | str | Path | None = None,
+    parser: str | Path | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    packages: Iterable[str] = (),
+    actions: Iterable[str] = (),
+    *,
+    glob: bool = False,
+    regex: bool = False,
+    ticks: bool = False,
+    timegap: timedelta | None = None,
+    cache: bool = False,
+    jobs: int = 1,
+) -> Iterator[Event]:
+    "Yield selected changes from given logs, see Log.events()"
+    log = Log(paths, parser, cache, jobs)
+    return log.events(
+        since,
+        until,
+        packages,
+        actions,
+        glob=glob,
+        regex=regex,
+        ticks=ticks,
+        timegap=timegap,
+    )
+
+
+def iter_transactions(
+    events: Iterable[Event], timegap: timedelta = timedelta(minutes=TIMEGAP)
+) -> Iterator[list[Event]]:
+    "Yield lists of the changes in given events, split where times are apart"
+    # Pass events with ticks to group changes the same as the command line
+    changes: list[Event] = []
+    last = datetime.max
+    for event in events:
+        if event.time - last > timegap and changes:
+            yield changes
+            changes = []
+
+        last = event.time
+        if event.action:
+            changes.append(event)
+
+    if changes:
+        yield changes
+
+
+def installed_net(events: Iterable[Event], days: float = NETDAYS) -> Iterator[Event]:
+    "Yield given changes of packages still installed after them, in time order"
+    # Changes before a package was last installed are not yielded, nor any
+    # for packages removed within days before being installed again
+    state = Events()
+    for event in events:
+        if event.action:
+            state.append(event)
+
+    return map(Event._make, state.installed_net(timedelta(days=days)))
+
+
+def installed_at(events: Iterable[Event]) -> Iterator[Event]:
+    "Yield install of each package installed after given changes, in time order"
+    state = Events()
+    for event in events:
+        if event.action:
+            state.append(event)
+
+    return map(Event._make, state.installed_at())
@@ -0,0 +1,237 @@
+"Persistent cache of events parsed from package log files."
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from .pkglog import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any
+
+CACHEDIR = Path(os.getenv('XDG_CACHE_HOME', '~/.cache'), 'pkglog')
+
+# Increment this whenever the format of the cache changes
+VERSION = 2
+
+
+@dataclass
+class Entry:
+    "Cached events for a single log file"
+
+    size: int
+    mtime: int
+    offset: int  # byte offset parsed to if file can be appended, else 0
+    state_in: bytes  # digest of parser state before this file
+    state_out: bytes  # pickled parser state after this file
+    events: list
+
+
+@dataclass
+class Checkpoint:
+    "Installed package state after a number of changes in the cached events"
+
+    files: list[tuple]  # (key, size, mtime, events read) of each file read
+    count: int  # number of changes read
+    time: datetime  # time of last change read
+    state: bytes  # pickled state
+
+
+class Cache:
+    "Cache of events for a set of log files, keyed on file identity"
+
+    def __init__(self, name: str, ident: str) -> None:
+        digest = hashlib.sha1(ident.encode()).hexdigest()[:16]
+        self.file = CACHEDIR.expanduser() / f'{name}-{digest}.pickle'
+        self.entries: dict[tuple[int, int], Entry] = {}
+        self.used: dict[tuple[int, int], Entry] = {}
+        self.checkpoints: dict[int, Checkpoint] = {}
+        self.changed = False
+
+        try:
+            with self.file.open('rb') as fp:
+                version, entries, checkpoints = pickle.load(fp)
+        except Exception:
+            return
+
+        if version == VERSION:
+            self.entries = entries
+            self.checkpoints = checkpoints
+
+    def events(
+        self, path: Path, parser: Any, parse: Callable[..., tuple[list, int]]
+    ) -> tuple[list, Any]:
+        "Return all events for given log file, and parser state after it"
+        stat = path.stat()
+        key = stat.st_dev, stat.st_ino
+
+        # Events depend on parser state carried in from previous files
+        try:
+            state_in = hashlib.sha1(pickle.dumps(parser)).digest()
+        except Exception:
+            # Can not cache a custom parser which can not be pickled
+            return parse(path, parser)[0], parser
+
+        entry = self.entries.get(key)
+        if entry and entry.state_in == state_in:
+            if entry.size == stat.st_size and entry.mtime == stat.st_mtime_ns:
+                self.used[key] = entry
+                return entry.events, pickle.loads(entry.state_out)
+
+            # If file has only been appended to then parse just the new tail
+            if entry.offset and stat.st_size > entry.size:
+                parser = pickle.loads(entry.state_out)
+                events, offset = parse(path, parser, entry.offset)
+                events = entry.events + events
+            else:
+                entry = None
+        else:
+            entry = None
+
+        if not entry:
+            events, offset = parse(path, parser)
+
+        self.used[key] = Entry(
+            stat.st_size,
+            stat.st_mtime_ns,
+            offset,
+            state_in,
+            pickle.dumps(parser),
+            events,
+        )
+        self.changed = True
+        return events, parser
+
+    def position(self, path: Path, count: int) -> tuple | None:
+        "Return position after count events of given file, as read in this run"
+        stat = path.stat()
+        key = stat.st_dev, stat.st_ino
+        if not (entry := self.used.get(key)):
+            return None
+
+        return key, entry.size, entry.mtime, count
+
+    def valid(self, checkpoint: Checkpoint, paths: list[Path]) -> bool:
+        "Return True if events before given checkpoint are unchanged in paths"
+        last = len(checkpoint.files) - 1
+        if last >= len(paths):
+            return False
+
+        for num, (key, size, mtime, _) in enumerate(checkpoint.files):
+            try:
+                stat = paths[num].stat()
+            except OSError:
+                return False
+
+            if (stat.st_dev, stat.st_ino) != key:
+                return False
+
+            if stat.st_size == size and stat.st_mtime_ns == mtime:
+                continue
+
+            # Only the last file may have changed, and only by appending new
+            # events after those already cached
+            entry = self.entries.get(key)
+            if num < last or stat.st_size < size or not (entry and entry.offset):
+                return False
+
+        return True
+
+    def checkpoint(self, paths: list[Path], until: datetime) -> Checkpoint | None:
+        "Return latest valid checkpoint for given log files, at or before until"
+        checkpoints = sorted(self.checkpoints.values(), key=lambda c: c.count)
+        for checkpoint in reversed(checkpoints):
+            if checkpoint.time <= until and self.valid(checkpoint, paths):
+                return checkpoint
+
+        return None
+
+    def add_checkpoint(self, key: int, checkpoint: Checkpoint) -> None:
+        "Add given checkpoint, replacing any previous with the same key"
+        self.checkpoints[key] = checkpoint
+        self.changed = True
+
+    def save(self) -> None:
+        "Save cache entries used in this run, discarding all others"
+        if not self.changed and self.used.keys() == self.entries.keys():
+            return
+
+        # Discard checkpoints which include any log file no longer used
+        self.checkpoints = {
+            key: checkpoint
+            for key, checkpoint in self.checkpoints.items()
+            if all(file[0] in self.used for file in checkpoint.files)
+        }
+
+        tmpfile = self.file.with_suffix('.tmp')
+        try:
+            self.file.parent.mkdir(parents=True, exist_ok=True)
+            with tmpfile.open('wb') as fp:
+                data = VERSION, self.used, self.checkpoints
+                pickle.dump(data, fp, pickle.HIGHEST_PROTOCOL)
+            tmpfile.replace(self.file)
+        except OSError:
+            tmpfile.unlink(missing_ok=True)
+
+
+class TimeIndex:
+    "Index of the first and last times of the rotated log files in a directory"
+
+    def __init__(self, name: str, ident: str) -> None:
+        digest = hashlib.sha1(ident.encode()).hexdigest()[:16]
+        self.file = CACHEDIR.expanduser() / f'{name}-times-{digest}.pickle'
+        self.entries: dict[tuple[str, int, int], dict[str, datetime | None]] = {}
+        self.changed = False
+
+        try:
+            with self.file.open('rb') as fp:
+                version, entries = pickle.load(fp)
+        except Exception:
+            return
+
+        if version == VERSION:
+            self.entries = entries
+
+    @staticmethod
+    def key(path: Path) -> tuple[str, int, int]:
+        stat = path.stat()
+        return path.name, stat.st_size, stat.st_mtime_ns
+
+    def time(
+        self, path: Path, name: str, get_time: Callable[[Path], datetime | None]
+    ) -> datetime | None:
+        "Return named time of given file, from the index or else get_time()"
+        entry = self.entries.setdefault(self.key(path), {})
+        if name not in entry:
+            entry[name] = get_time(path)
+            self.changed = True
+
+        return entry[name]
+
+    def save(self, paths: list[Path]) -> None:
+        "Save index entries of given files, discarding all others"
+        keys = set()
+        for path in paths:
+            try:
+                keys.add(self.key(path))
+            except OSError:
+                pass
+
+        entries = {k: v for k, v in self.entries.items() if k in keys and v}
+        if not self.changed and entries.keys() == self.entries.keys():
+            return
+
+        tmpfile = self.file.with_suffix('.tmp')
+        try:
+            self.file.parent.mkdir(parents=True, exist_ok=True)
+            with tmpfile.open('wb') as fp:
+                pickle.dump((VERSION, entries), fp, pickle.HIGHEST_PROTOCOL)
+            tmpfile.replace(self.file)
+        except OSError:
+            tmpfile.unlink(missing_ok=True)
@@ -0,0 +1,165 @@
+"Follow a log file for newly appended lines, as tail -F does."
+
+from __future__ import annotations
+
+import os
+import select
+import struct
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from .pkglog import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import BinaryIO
+
+# Inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+
+# Inotify event header is wd, mask, cookie, and length of following name
+EVENT = struct.Struct('iIII')
+
+# Min and max seconds between polls of log file, if inotify not available
+MINPOLL = 0.1
+MAXPOLL = 2.0
+
+# Read log file in blocks of up to this many bytes
+READSIZE = 64 * 1024
+
+
+class Inotify:
+    "Wait for changes to a file using Linux inotify"
+
+    def __init__(self, path: Path) -> None:
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.name = os.fsencode(path.name)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        # Watch directory so we also see the file being replaced on rotation
+        mask = IN_MODIFY | IN_CREATE | IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(path.parent), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f'can not watch {path.parent}')
+
+    def changed(self) -> bool:
+        "Read pending events, return True if any were for our file"
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+
+            pos = 0
+            while pos < len(data):
+                _, _, _, length = EVENT.unpack_from(data, pos)
+                pos += EVENT.size
+                if data[pos : pos + length].rstrip(b'\0') == self.name:
+                    changed = True
+                pos += length
+
+    def wait(self, timeout: float) -> bool:
+        "Wait for file to change, return False if not changed within timeout"
+        end = time.monotonic() + timeout
+        while (remaining := end - time.monotonic()) > 0:
+            if select.select([self.fd], [], [], remaining)[0] and self.changed():
+                return True
+
+        return False
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class Poll:
+    "Wait for changes to a file by polling it, less often while it is idle"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.interval = MINPOLL
+        self.state = self.get_state()
+
+    def get_state(self) -> tuple[int, int, int] | None:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def wait(self, timeout: float) -> bool:
+        "Wait for file to change, return False if not changed within timeout"
+        end = time.monotonic() + timeout
+        while (remaining := end - time.monotonic()) > 0:
+            time.sleep(min(self.interval, remaining))
+            if (state := self.get_state()) != self.state:
+                self.state = state
+                self.interval = MINPOLL
+                return True
+
+            self.interval = min(self.interval * 2, MAXPOLL)
+
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+def follow_log(
+    path: Path, fp: BinaryIO, idle: Callable[[bool], None], timeout: float
+) -> Iterator[bytes]:
+    "Yield blocks of whole lines from given open log file, then as appended"
+    # Calls idle(False) each time before waiting for more lines, and
+    # idle(True) when none have been appended for timeout seconds
+    try:
+        watcher: Inotify | Poll = Inotify(path)
+    except Exception:
+        watcher = Poll(path)
+
+    partial = b''
+    fpnew = None
+    try:
+        while True:
+            while data := fp.read(READSIZE):
+                # Keep any line which is still being written until the rest
+                # of it is read
+                data = partial + data
+                end = data.rfind(b'\n') + 1
+                partial = data[end:]
+                if end:
+                    yield data[:end]
+
+            # If log has been rotated then start reading the new file. Any
+            # lines written to the old file have been read above.
+            try:
+                stat = path.stat()
+            except OSError:
+                stat = None
+
+            if stat and stat.st_ino != os.fstat(fp.fileno()).st_ino:
+                if fpnew:
+                    fpnew.close()
+                fp = fpnew = path.open('rb')
+                partial = b''
+                continue
+
+            # Start again if the log has been truncated
+            if stat and stat.st_size < fp.tell():
+                fp.seek(0)
+                partial = b''
+                continue
+
+            idle(False)
+            if not watcher.wait(timeout):
+                idle(True)
+    finally:
+        watcher.close()
+        if fpnew:
+            fpnew.close()
@@ -0,0 +1,95 @@
+"Machine readable output formats for package change events."
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime
+
+FIELDS = ('time', 'action', 'package', 'old_version', 'new_version', 'after_boot')
+
+# Events from many hosts have the host, but not whether after last boot
+HOST_FIELDS = ('host', *FIELDS[:-1])
+
+
+def versions(action: str, vers: str) -> tuple[str | None, str | None]:
+    "Return old and new version from version string for given action"
+    old, sep, new = vers.partition(' -> ')
+    if sep:
+        return old, new
+
+    return (vers, None) if action == 'removed' else (None, vers)
+
+
+class Format:
+    "Base class to format events, each passed to write() as soon as given"
+
+    def __init__(self, write: Callable[[str], None], hosts: bool = False) -> None:
+        self.write = write
+        self.fields = HOST_FIELDS if hosts else FIELDS
+
+    def event(self, dt: datetime, action: str, pkg: str, vers: str, boot: bool) -> None:
+        "Format given event"
+        self.row((dt.isoformat(), action, pkg, *versions(action, vers), boot))
+
+    def host_event(
+        self, host: str, dt: datetime, action: str, pkg: str, vers: str
+    ) -> None:
+        "Format given event from given host"
+        self.row((host, dt.isoformat(), action, pkg, *versions(action, vers)))
+
+    def row(self, values: tuple) -> None:
+        "Format given values of all fields"
+        raise NotImplementedError
+
+    def end(self) -> None:
+        "Finish output after last event"
+
+
+class NDJSON(Format):
+    "One JSON object per line"
+
+    def __init__(self, write: Callable[[str], None], hosts: bool = False) -> None:
+        import json
+
+        super().__init__(write, hosts)
+        self.dumps = json.dumps
+
+    def record(self, values: tuple) -> str:
+        "Return JSON object for given values"
+        return self.dumps(dict(zip(self.fields, values)))
+
+    def row(self, values: tuple) -> None:
+        self.write(self.record(values) + '\n')
+
+
+class JSON(NDJSON):
+    "A single JSON array of objects"
+
+    def __init__(self, write: Callable[[str], None], hosts: bool = False) -> None:
+        super().__init__(write, hosts)
+        self.sep = '[\n'
+
+    def row(self, values: tuple) -> None:
+        self.write(self.sep + self.record(values))
+        self.sep = ',\n'
+
+    def end(self) -> None:
+        self.write('[]\n' if self.sep == '[\n' else '\n]\n')
+
+
+class CSV(Format):
+    "Comma separated values, with header line"
+
+    def __init__(self, write: Callable[[str], None], hosts: bool = False) -> None:
+        import csv
+
+        super().__init__(write, hosts)
+        self.writer = csv.writer(self, lineterminator='\n')
+        self.writer.writerow(self.fields)
+
+    def row(self, values: tuple) -> None:
+        # Write booleans as 1 or 0
+        self.writer.writerow(int(v) if isinstance(v, bool) else v for v in values)
+
+
+FORMATS = {'json': JSON, 'ndjson': NDJSON, 'csv': CSV}
@@ -3,13 +3,21 @@
 
 from __future__ import annotations
 
-import re
-from collections.abc import Generator, Sequence
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
-from datetime import datetime
+
+from pkglog.timestamp import parse_time
 
 logfile = '/var/log/apt/history.log'
 
+# Parser carries no state across transactions
+stateless = True
+
+# Log is not prefiltered for packages, since every action line must be
+# parsed as only the last of each transaction is reported, and these are
+# nearly all of the log anyway
+keep_lines = None
+
 _ACTIONS = {
     'Upgrade': 'upgraded',
     'Downgrade': 'downgraded',
@@ -24,35 +32,30 @@ class Parser:
     action: str = ''
     line: str = ''
 
-    def get_time(self, line: str) -> datetime | None:
-        vals = line.split(':', maxsplit=1)
-        if len(vals) != 2:
-            return None
-
-        func, rest = vals
-
-        if func == 'Start-Date':
-            self.action = ''
-            return None
-
-        if func == 'End-Date':
-            try:
-                return datetime.fromisoformat(rest[1:].strip().replace('  ', ' '))
-            except Exception:
-                return None
-
-        action = _ACTIONS.get(func)
-        if action:
-            self.action = action
-            self.line = rest[1:]
-        return None
-
-    def get_packages(self) -> Generator[Sequence[str]]:
-        if self.action:
-            for pline in self.line.strip().split('),'):
-                pkg, vers = pline.split(maxsplit=1)
-                pkg = re.sub(':.*', '', pkg)
-                vers = vers.strip().strip('()')
-                vers = vers.replace(', automatic', '')
-                vers = vers.replace(', ', ' -> ')
-                yield self.action, pkg, vers
+    def parse_lines(self, lines: Iterable[str]) -> Iterator[tuple]:
+        for line in lines:
+            func, sep, rest = line.strip().partition(':')
+            if not sep:
+                continue
+
+            if func == 'Start-Date':
+                self.action = ''
+            elif func == 'End-Date':
+                if not (dt := parse_time(rest[1:].strip().replace('  ', ' '))):
+                    continue
+
+                if not self.action:
+                    yield dt, '', '', ''
+                    continue
+
+                for pline in self.line.strip().split('),'):
+                    pkg, vers = pline.split(maxsplit=1)
+                    pkg = pkg.partition(':')[0]
+                    vers = vers.strip().strip('()')
+                    vers = vers.replace(', automatic', '')
+                    vers = vers.replace(', ', ' -> ')
+                    yield dt, self.action, pkg, vers
+
+            elif action := _ACTIONS.get(func):
+                self.action = action
+                self.line = rest[1:]
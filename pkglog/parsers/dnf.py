@@ -4,12 +4,22 @@
 from __future__ import annotations
 
 import re
-from collections.abc import Generator, Sequence
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
-from datetime import datetime
+
+from pkglog.timestamp import parse_localtime
 
 logfile = '/var/log/dnf.rpm.log'
 
+# Parser is not stateless since the new version of each upgrade is
+# logged on a line before the old version, which may be searched past
+
+# Every line a package event is parsed from names that package
+keep_lines = ()
+
+# Lines without this, e.g. scriptlet output, are never parsed
+markers = ('SUBDEBUG',)
+
 # Action mapped to log entry and is_change? flag = yes(1)/no(0)
 _ACTIONS = {
     'Upgraded': ('upgraded', 1),
@@ -20,53 +30,40 @@ _ACTIONS = {
 }
 
 
+_ARCH = re.compile(r'\.[^.]+$')
+_PKGVERS = re.compile(r'^(.+?)-(\d.*)$')
+
+
 @dataclass
 class Parser:
     vers: dict[str, str] = field(default_factory=dict)
-    pkgs: Sequence[str] = field(default_factory=tuple)
-
-    def get_time(self, line: str) -> datetime | None:
-        fields = line.split(maxsplit=3)
-
-        if len(fields) != 4:
-            return None
-
-        dts, key, action, rest = fields
-
-        if key != 'SUBDEBUG':
-            return None
 
-        action = action[:-1]
-        pkg = re.sub(r'\.[^.]+$', '', rest)
-        if m := re.match(r'^(.+?)-(\d.*)$', pkg):
-            pkg, vers = m.group(1), m.group(2)
-        else:
-            return None
+    def parse_lines(self, lines: Iterable[str]) -> Iterator[tuple]:
+        for line in lines:
+            fields = line.strip().split(maxsplit=3)
 
-        action, change = _ACTIONS.get(action, ('', 0))
-        if not action:
-            self.vers[pkg] = vers
-            return None
+            if len(fields) != 4:
+                continue
 
-        if change:
-            vers = vers + ' -> ' + self.vers.get(pkg, '?')
+            dts, key, action, rest = fields
 
-        self.pkgs = (action, pkg, vers)
+            if key != 'SUBDEBUG':
+                continue
 
-        dts = dts.strip()
-        index = dts.find('+')
-        if index < 0:
-            dts = dts.replace('Z', '+00:00')
-        else:
-            dts = dts[: index + 3] + ':' + dts[index + 3 :]
+            action = action[:-1]
+            if m := _PKGVERS.match(_ARCH.sub('', rest)):
+                pkg, vers = m.group(1), m.group(2)
+            else:
+                continue
 
-        # Return the logged time in localtime
-        try:
-            dt = datetime.fromisoformat(dts).astimezone().replace(tzinfo=None)
-        except Exception:
-            return None
+            action, change = _ACTIONS.get(action, ('', 0))
+            if not action:
+                self.vers[pkg] = vers
+                continue
 
-        return dt
+            if change:
+                vers = vers + ' -> ' + self.vers.get(pkg, '?')
 
-    def get_packages(self) -> Generator[Sequence[str]]:
-        yield self.pkgs
+            # Return the logged time in localtime
+            if dt := parse_localtime(dts.strip()):
+                yield dt, action, pkg, vers
@@ -3,59 +3,35 @@
 
 from __future__ import annotations
 
-import sys
-from collections.abc import Generator, Sequence
-from dataclasses import dataclass
 from datetime import datetime
 
-logfile = '/var/log/pacman.log'
-
-_LINETYPES = {'[ALPM]', '[PACMAN]'}
-
-
-@dataclass
-class Parser:
-    line: str = ''
+from pkglog.pattern import PatternParser
+from pkglog.timestamp import parse_localtime
 
-    def get_time(self, line: str) -> datetime | None:
-        # Handle old format pacman logs
-        if len(line) > 11 and line[11] == ' ':
-            line = line[:11] + 'T' + line[12:]
-
-        vals = line.split(maxsplit=2)
-        if len(vals) != 3:
-            return None
+logfile = '/var/log/pacman.log'
 
-        dts, linetype, rest = vals
+# Parser carries no state across transactions
+stateless = True
 
-        if linetype not in _LINETYPES:
-            return None
+# Every line a package event is parsed from names that package
+keep_lines = ()
 
-        # Pacman log sometimes has stray leading nulls
-        dts = dts.lstrip().lstrip('\0').strip()
+# Lines without one of these, e.g. scriptlet output, are never parsed
+markers = ('[ALPM]', '[PACMAN]')
 
-        # Add missing ":" in timezone which fromisoformat() < 3.11 requires
-        if sys.version_info < (3, 11) and ('+' in dts or '-' in dts):
-            if len(dts) < 24:
-                return None
-            dts = f'{dts[:23]}:{dts[23:]}'
+_ACTIONS = ('installed', 'removed', 'upgraded', 'downgraded', 'reinstalled')
 
-        try:
-            dt = datetime.fromisoformat(dts[1:-1])
-        except Exception:
-            return None
 
-        self.line = rest
+class Parser(PatternParser):
+    # Pacman log sometimes has stray leading nulls. Old format logs have a
+    # space between the date and time.
+    pattern = (
+        r'\s*\0*\s*\[(?P<time>[^]]*)\]\s+\[(?:ALPM|PACMAN)\]'
+        rf'(?:\s+(?P<action>{"|".join(_ACTIONS)})\s+(?P<package>\S+)'
+        r'\s+\((?P<version>.*)\)\s*$)?'
+    )
+    actions = {action: action for action in _ACTIONS}
 
+    def time(self, dts: str) -> datetime | None:
         # We also convert the logged time to localtime
-        return dt.astimezone().replace(tzinfo=None)
-
-    def get_packages(self) -> Generator[Sequence[str]]:
-        try:
-            res = self.line.strip().split(maxsplit=2)
-        except Exception:
-            return
-
-        if res and len(res) == 3:
-            res[2] = res[2][1:-1]
-            yield res
+        return parse_localtime(dts.strip())
@@ -3,78 +3,48 @@
 
 from __future__ import annotations
 
-import sys
-from collections.abc import Generator, Sequence
-from dataclasses import dataclass
-from datetime import datetime
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+from pkglog.timestamp import parse_time
+from pkglog.version import compare
 
 # User may want to chmod 755 the "/var/log/zypp" directory so they can
 # run this tool as normal user.
 logfile = '/var/log/zypp/history'
 
-_pkgs = {}  # type: ignore
+# Every line a package event is parsed from names that package
+keep_lines = ()
 
 
 @dataclass
 class Parser:
-    pkg: str = ''
-    vers: str = ''
-    oldvers: str = ''
-    removed: bool = False
-
-    #
-    def __init__(self):
-        self.pkg = ''
-        self.vers = ''
-        self.oldvers = ''
-        self.removed = False
-
-    def get_time(self, line: str) -> datetime | None:
-        vals = line.split('|', maxsplit=4)
-        if len(vals) < 4:
-            return None
-
-        dts, func, pkg, vers, _ = vals
-
-        if func == 'install':
-            self.oldvers = _pkgs.get(pkg, '')
-            _pkgs[pkg] = vers
-            self.removed = False
-        elif func == 'remove':
-            self.oldvers = ''
-            _pkgs.pop(pkg, None)
-            self.removed = True
-        else:
-            return None
-
-        self.pkg = pkg
-        self.vers = vers
-
-        try:
-            dt = datetime.fromisoformat(dts.strip())
-        except Exception:
-            return None
-
-        return dt
-
-    def get_packages(self) -> Generator[Sequence[str]]:
-        try:
-            from looseversion import LooseVersion as Version  # type: ignore
-        except Exception:
-            sys.exit(
-                'Error: Need to install Python looseversion package to use zypper parsing.'
-            )
-
-        if self.removed:
-            action = 'removed'
-        elif self.oldvers:
-            if self.vers == self.oldvers:
-                action = 'reinstalled'
+    pkgs: dict[str, str] = field(default_factory=dict)
+
+    def parse_lines(self, lines: Iterable[str]) -> Iterator[tuple]:
+        for line in lines:
+            vals = line.strip().split('|', maxsplit=4)
+            if len(vals) < 5:
+                continue
+
+            dts, func, pkg, vers, _ = vals
+
+            if func == 'install':
+                oldvers = self.pkgs.get(pkg, '')
+                self.pkgs[pkg] = vers
+                if not oldvers:
+                    action = 'installed'
+                elif vers == oldvers:
+                    action = 'reinstalled'
+                else:
+                    up = compare(vers, oldvers) > 0
+                    action = 'upgraded' if up else 'downgraded'
+                    vers = f'{oldvers} -> {vers}'
+            elif func == 'remove':
+                self.pkgs.pop(pkg, None)
+                action = 'removed'
             else:
-                up = Version(self.vers) > Version(self.oldvers)
-                action = 'upgraded' if up else 'downgraded'
-                self.vers = f'{self.oldvers} -> {self.vers}'
-        else:
-            action = 'installed'
+                continue
 
-        yield action, self.pkg, self.vers
+            if dt := parse_time(dts.strip()):
+                yield dt, action, pkg, vers
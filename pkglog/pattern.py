@@ -0,0 +1,49 @@
+"Shared engine for parsers which declare a regex to match their log lines."
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from functools import lru_cache
+
+from .timestamp import parse_time
+
+
+@lru_cache
+def _compile(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+class PatternParser:
+    "Base class for parsers which declare a regex, and action mapping"
+
+    # Regex to match from the start of each wanted log line, with named
+    # groups time, action, package, and version, and any others the parser
+    # needs. A line where the action group is empty or unmatched is a timed
+    # line without a change.
+    pattern: str = ''
+
+    # Map of each logged action to the action yielded for it
+    actions: dict[str, str] = {}
+
+    def time(self, dts: str) -> datetime | None:
+        "Return time for given time stamp group, or None if invalid"
+        # Override this for time stamps which are not in ISO format
+        return parse_time(dts)
+
+    def change(self, dt: datetime, match: re.Match) -> tuple | None:
+        "Return event for given time and match of a line, or None if none"
+        # Override this to keep any state the parser needs from each line
+        if action := self.actions.get(match['action']):
+            return dt, action, match['package'], match['version']
+
+        return None if match['action'] else (dt, '', '', '')
+
+    def parse_lines(self, lines: Iterable[str]) -> Iterator[tuple]:
+        match = _compile(self.pattern).match
+        get_time = self.time
+        change = self.change
+        for m in filter(None, map(match, lines)):
+            if (dt := get_time(m['time'])) and (event := change(dt, m)):
+                yield event
@@ -5,22 +5,62 @@
 from __future__ import annotations
 
 import fileinput
-import fnmatch
 import os
 import re
-import shlex
 import sys
 from argparse import ArgumentParser, Namespace
+from array import array
+from collections.abc import Callable, Iterable, Iterator
 from datetime import date, datetime, time, timedelta
+from functools import cached_property, partial
 from importlib import util
+from itertools import chain, groupby, repeat
 from pathlib import Path
 
+# Same as typing.TYPE_CHECKING, without importing typing at run time, so
+# also imported from here by the other modules of this package
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import BinaryIO, TextIO
+
+    from .formats import Format
+    from .stats import Stats
+
 TIMEGAP = 2  # mins
 PATHSEP = ':'
 
 DAYS = 30
 NETDAYS = 2
 
+# Compressed log file suffixes which can not be randomly accessed
+COMPRESSED = {'.gz', '.bz2'}
+
+# Stop binary search of log file when within this many bytes
+SEEKSIZE = 64 * 1024
+
+# Read and decode log files in blocks of about this many bytes
+READSIZE = 64 * 1024
+
+# Lines skipped by the prefilter are parsed for their times in batches of
+# up to this many, if they are needed to group changes
+TICKLINES = 256
+
+# Keep all remaining lines instead, once this many have been read, if more
+# than half of them had to be parsed for their times
+TICKCHECK = 4096
+
+# Stop searching a log file for lines, and just read all lines, if this
+# many are found less than SCANGAP bytes apart on average
+SCANCHECK = 256
+SCANGAP = 256
+
+# Save a checkpoint of installed package state to the cache after reading
+# each this many changes
+CHECKPOINT = 50000
+
+# Buffer this many output lines before writing them
+WRITELINES = 1024
+
 # Define ANSI escape sequences for colors ..
 # Refer https://en.wikipedia.org/wiki/ANSI_escape_code#Colors
 COLOR_red = '\033[31m'
@@ -40,32 +80,177 @@ ACTIONS = {
     'reinstalled': (4, COLOR_cyan),
 }
 
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+# Queued event times are stored as integer microseconds since this epoch
+EPOCH = datetime(1970, 1, 1)
+USEC = timedelta(microseconds=1)
+
 MODDIR = Path(__file__).parent.resolve()
 CNFFILE = Path(os.getenv('XDG_CONFIG_HOME', '~/.config'), f'{MODDIR.name}-flags.conf')
 
+# Set this environment variable to report stats, same as --stats option
+STATSENV = 'PKGLOG_STATS'
+
+# Timings and counts of each stage, only collected if requested
+stats: Stats | None = None
+
+
+class Events:
+    "Compact store of all events, for when they are not output in groups"
+
+    def __init__(self) -> None:
+        self.times = array('q')  # microseconds since EPOCH
+        self.actions = bytearray()
+        self.pkgs = array('L')
+        self.vers = array('L')
+        self.ids: dict[str, int] = {}  # interned package names and versions
+        self.installed: dict[str, int] = {}
+        self.installed_previously: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, event: tuple[datetime, str, str, str]) -> None:
+        "Append given event"
+        dt, action, pkg, vers = event
+        t = (dt - EPOCH) // USEC
+        actcode, _ = ACTIONS[action]
+        if actcode == 1:
+            self.installed[pkg] = t
+        elif actcode == 2:
+            self.installed.pop(pkg, None)
+            self.installed_previously[pkg] = t
+
+        ids = self.ids
+        self.times.append(t)
+        self.actions.append(ACTION_CODES[action])
+        self.pkgs.append(ids.setdefault(pkg, len(ids)))
+        self.vers.append(ids.setdefault(vers, len(ids)))
+
+    def installed_net(self, days: timedelta) -> Iterator[tuple]:
+        "Yield events for installed packages, not recently removed before"
+        usecs = days // USEC
+        actions = list(ACTIONS)
+        strings = list(self.ids)
+        for t, action, pkg, vers in zip(self.times, self.actions, self.pkgs, self.vers):
+            name = strings[pkg]
+            pkgt = self.installed.get(name)
+            if pkgt is None or t < pkgt:
+                continue
+            pkgt_rm = self.installed_previously.get(name)
+            if pkgt_rm is not None and (pkgt - pkgt_rm) < usecs:
+                continue
+
+            yield EPOCH + t * USEC, actions[action], name, strings[vers]
+
+    def installed_at(self) -> Iterator[tuple]:
+        "Yield install event of each installed package, with its latest version"
+        strings = list(self.ids)
+        latest = dict(zip(self.pkgs, self.vers))
+        for name, t in sorted(self.installed.items(), key=lambda x: x[1]):
+            vers = strings[latest[self.ids[name]]]
+            yield EPOCH + t * USEC, 'installed', name, vers.rsplit(' -> ', 1)[-1]
+
+    def prune(self, select: Callable[[str, str], bool] | None = None) -> Events:
+        "Return copy with only selected events which installed_net() can yield"
+        # Events of packages since removed, or from before they were last
+        # installed, will never be yielded
+        new = Events()
+        new.installed = self.installed.copy()
+        new.installed_previously = self.installed_previously.copy()
+        actions = list(ACTIONS)
+        strings = list(self.ids)
+        ids = new.ids
+        for t, action, pkg, vers in zip(self.times, self.actions, self.pkgs, self.vers):
+            name = strings[pkg]
+            pkgt = self.installed.get(name)
+            if pkgt is None or t < pkgt:
+                continue
+            if select and not select(actions[action], name):
+                continue
+
+            new.times.append(t)
+            new.actions.append(action)
+            new.pkgs.append(ids.setdefault(name, len(ids)))
+            new.vers.append(ids.setdefault(strings[vers], len(ids)))
+
+        return new
+
 
 class Queue:
-    queue = []  # type: ignore
-    installed = {}  # type: ignore
-    installed_previously = {}  # type: ignore
-    installed_net_days: timedelta
-    no_color: bool
+    queue: list = []
+    lines: list[str] = []
+    format: Format | None = None
+    colors: dict[str, str] = {}
+    reset: str = ''
     boottime: datetime
     bootstr: str = ''
     delim: str = ''
+    out: TextIO | None = None  # else standard output
+
+    @classmethod
+    def new(cls) -> type[Queue]:
+        "Return a subclass of this with its own output state once set up"
+        return type(cls.__name__, (cls,), {})
+
+    @classmethod
+    def setup(cls, args: Namespace, color: bool) -> None:
+        "Set up for output of changes selected by given options"
+        cls.queue = []
+        cls.lines = []
+        if color:
+            cls.colors = {action: prefix for action, (_, prefix) in ACTIONS.items()}
+            cls.reset = COLOR_reset
+        else:
+            cls.colors = dict.fromkeys(ACTIONS, '')
+            cls.reset = ''
+
+        if not args.package and not (args.installed or args.installed_only):
+            cls.delim = 80 * '-'
+        else:
+            cls.delim = ''
+
+        # Get last boot time
+        upsecs = float(Path('/proc/uptime').read_text().split()[0])
+        cls.boottime = datetime.now() - timedelta(seconds=upsecs)
+
+        cls.format = None
+        cls.bootstr = ''
+        if args.format != 'text':
+            from .formats import FORMATS
+
+            cls.format = FORMATS[args.format](cls.lines.append, bool(args.hosts))
+        elif not (args.package or args.boot or args.hosts or args.at):
+            timestr = cls.boottime.isoformat(' ', 'seconds')
+            cls.bootstr = f'{timestr} ### LAST SYSTEM BOOT ###'
 
     @classmethod
     def print(cls, color: str | None, *msg: str) -> None:
-        "Output given message"
+        "Buffer given message for output"
         for m in msg:
             if m:
-                if cls.no_color:
-                    print(m)
-                else:
-                    if color:
-                        m = color + m
+                cls.lines.append(f'{color or ""}{m}{cls.reset}\n')
 
-                    print(m + COLOR_reset)
+    @classmethod
+    def write(cls, flush: bool = False) -> None:
+        "Write buffered messages to standard output in large chunks"
+        out = cls.out or sys.stdout
+        try:
+            if len(cls.lines) >= WRITELINES or flush and cls.lines:
+                data = ''.join(cls.lines).encode(out.encoding, out.errors or 'strict')
+                out.buffer.write(data)
+                cls.lines.clear()
+            if flush:
+                out.buffer.flush()
+        except BrokenPipeError:
+            if cls.out:
+                raise
+
+            # Reader has gone (e.g. pager quit) so stop immediately, and
+            # redirect stdout so Python does not fail flushing it at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
 
     @classmethod
     def output(cls, args: Namespace) -> None:
@@ -76,36 +261,19 @@ class Queue:
         out = []
         maxlen = 1
 
+        if cls.format:
+            for dt, action, pkg, vers in cls.queue:
+                cls.format.event(dt, action, pkg, vers, dt > cls.boottime)
+
+            cls.queue.clear()
+            cls.write()
+            return
+
         # First loop to extract data and determine longest package name in
         # this transaction set
         for dt, action, pkg, vers in cls.queue:
-            actcode, color = ACTIONS[action]
-            if args.updated_only:
-                if actcode != 3:
-                    continue
-            if args.installed or args.installed_only:
-                if actcode > 2:
-                    continue
-                if args.installed_only and actcode > 1:
-                    continue
-            if args.package:
-                for arg_pkg in args.package:
-                    if args.regex:
-                        if arg_pkg.search(pkg):
-                            break
-                    elif pkg == arg_pkg:
-                        break
-                else:
-                    continue
-
-            if args.installed_net:
-                pkgdt = cls.installed.get(pkg)
-                if not pkgdt or dt < pkgdt:
-                    continue
-                pkgdt_rm = cls.installed_previously.get(pkg)
-                if pkgdt_rm and (pkgdt - pkgdt_rm) < cls.installed_net_days:
-                    continue
-
+            actcode, _ = ACTIONS[action]
+            color = cls.colors[action]
             if actcode != 3 or args.verbose:
                 vers += ' ' + action
             out.append((dt, pkg, vers, color))
@@ -113,6 +281,7 @@ class Queue:
                 maxlen = max(maxlen, len(pkg))
 
         # Now output justified lines to screen
+        lines = cls.lines
         for num, (dt, pkg, vers, color) in enumerate(out):
             if cls.bootstr and dt > cls.boottime:
                 cls.print(None, cls.delim, cls.bootstr, cls.delim)
@@ -120,21 +289,32 @@ class Queue:
             elif num == 0:
                 cls.print(None, cls.delim)
 
-            cls.print(color, f'{dt} {pkg:{maxlen}} {vers}')
+            lines.append(f'{color}{dt} {pkg:{maxlen}} {vers}{cls.reset}\n')
 
         cls.queue.clear()
+        cls.write()
+
+    @classmethod
+    def finish(cls, args: Namespace) -> None:
+        "Output any remaining queued transactions, and flush all output"
+        cls.output(args)
+        if cls.bootstr:
+            cls.print(None, cls.delim, cls.bootstr)
+
+        if cls.format:
+            cls.format.end()
+
+        cls.write(flush=True)
 
     @classmethod
     def append(cls, dt: datetime, action: str, pkg: str, vers: str) -> None:
         "Append this package + action to the internal queue"
-        actcode, _ = ACTIONS[action]
-        if actcode == 1:
-            cls.installed[pkg] = dt
-        elif actcode == 2:
-            cls.installed.pop(pkg, None)
-            cls.installed_previously[pkg] = dt
-
-        cls.queue.append((dt, action, pkg, vers))
+        if cls.format:
+            # Machine readable output is not grouped so output immediately
+            cls.format.event(dt, action, pkg, vers, dt > cls.boottime)
+            cls.write()
+        else:
+            cls.queue.append((dt, action, pkg, vers))
 
 
 def import_path(path: Path):
@@ -151,11 +331,927 @@ class Module:
     "Class to wrap parser module files"
 
     def __init__(self, path: Path) -> None:
-        self.module = import_path(path)
-        if not hasattr(self.module, 'logfile'):
-            sys.exit(f'Must define logfile attribute for {path}')
+        self.path = path
+
+        # Read description and log file statically from the source so we
+        # only need to import the parser module which is actually used
+        text = path.read_text()
+        doc = re.match(r'(?:\s*#[^\n]*\n)*\s*("""|\'\'\'|"|\')(.*?)\1', text, re.S)
+        self.desc = doc[2].strip() if doc else ''
+        logfile = re.search(r'^logfile\s*=\s*([\'"])(.+?)\1', text, re.M)
+        self.logfile = Path(logfile[2]) if logfile else None
+
+    @cached_property
+    def module(self):
+        "Import the parser module on first use"
+        module = import_path(self.path)
+        if not hasattr(module, 'logfile'):
+            raise ValueError(f'Must define logfile attribute for {self.path}')
+
+        return module
+
+    def load(self):
+        "Import the parser module now, e.g. to report any error in it early"
+        return self.module
+
+    @property
+    def stateless(self) -> bool:
+        # Parser declares it carries no state across transactions so we
+        # can start reading the log from any transaction boundary
+        return getattr(self.module, 'stateless', False)
+
+    @property
+    def keep_lines(self) -> tuple[str, ...] | None:
+        # Line prefixes the parser must always see, even when we are
+        # filtering for specific packages, because it keeps state from them.
+        # None if parser does not declare this, so can not be prefiltered.
+        return getattr(self.module, 'keep_lines', None)
+
+    @property
+    def markers(self) -> tuple[str, ...]:
+        # Strings at least one of which is in every line the parser needs,
+        # so any other lines can be skipped. Empty if not declared.
+        return getattr(self.module, 'markers', ())
+
+
+def find_modules() -> tuple[dict[str, Module], str]:
+    "Return all bundled parser modules, and name of the default for this system"
+    modules = {}
+    default = ''
+    for m in (MODDIR / 'parsers').glob('[!_]*.py'):
+        modules[m.stem] = mod = Module(m)
+        if not default and mod.logfile and mod.logfile.exists():
+            default = m.stem
+
+    return modules, default
+
+
+def line_time(lineb: bytes, parser) -> datetime | None:
+    "Return time of given log line, if any"
+    if stats:
+        # Lines read to search the log are not counted as parsed
+        stats.searching = True
+        try:
+            event = next(get_events((decode_line(lineb),), parser), None)
+        finally:
+            stats.searching = False
+    else:
+        event = next(get_events((decode_line(lineb),), parser), None)
 
-        self.logfile = Path(self.module.logfile)
+    return event[0] if event else None
+
+
+def first_time(path: Path, parser) -> datetime | None:
+    "Return time of first timed line in given log file, if any"
+    with fileinput.hook_compressed(str(path), 'rb') as fp:
+        for lineb in fp:
+            if dt := line_time(lineb, parser):  # type: ignore
+                return dt
+
+    return None
+
+
+def last_time(path: Path, parser) -> datetime | None:
+    "Return time of last timed line in given log file, if any"
+    with fileinput.hook_compressed(str(path), 'rb') as fp:
+        # Compressed files can only be read from the start
+        if path.suffix in COMPRESSED:
+            lines = fp.read().split(b'\n')  # type: ignore
+            pos = 0
+        else:
+            pos = fp.seek(0, os.SEEK_END)
+            lines = [b'']
+
+        # Search back through the file a block at a time
+        while True:
+            for lineb in reversed(lines[1:] if pos > 0 else lines):
+                if dt := line_time(lineb, parser):
+                    return dt
+
+            if pos <= 0:
+                return None
+
+            start = max(pos - SEEKSIZE, 0)
+            fp.seek(start)
+            lines = (fp.read(pos - start) + lines[0]).split(b'\n')  # type: ignore
+            pos = start
+
+
+def skip_files(filelist: list[Path], module: Module, start_time: datetime) -> list:
+    "Return given log files, without rotated files older than start_time"
+    # A rotated file is not needed if the next newer file in the same
+    # directory starts before start_time, or if it ends before start_time.
+    # Newer files are checked first, so older (and usually compressed)
+    # files are never opened. The first and last times of rotated files
+    # are also kept in a small index so they are usually found without
+    # opening the files at all.
+    from .cache import TimeIndex
+
+    parser = module.module.Parser()
+    first = partial(first_time, parser=parser)
+    last = partial(last_time, parser=parser)
+    ident = f'{module.path.resolve()}:{module.path.stat().st_mtime_ns}:'
+    files = []
+    for parent, group in groupby(filelist, key=lambda p: p.parent):
+        rotated = list(group)
+        index = TimeIndex(module.path.stem, ident + str(parent.resolve()))
+
+        # The newest file is still being written to so is not indexed
+        live = len(rotated) - 1
+        start = 0
+        for n in range(live, 0, -1):
+            if n == live:
+                dt = first(rotated[n])
+            else:
+                dt = index.time(rotated[n], 'first', first)
+
+            if dt and dt < start_time:
+                start = n
+                break
+
+        if start < live and (dt := index.time(rotated[start], 'last', last)):
+            if dt < start_time:
+                start += 1
+
+        files.extend(rotated[start:])
+        index.save(rotated[:live])
+
+    return files
+
+
+def seek_start(fp, parser, start_time: datetime) -> None:
+    "Position time sequenced log file at first transaction from start_time"
+
+    def get_next_time(pos: int) -> datetime | None:
+        "Return time of first timed line after given position"
+        fp.seek(pos)
+        if pos > 0:
+            fp.readline()
+
+        for lineb in fp:
+            if dt := line_time(lineb, parser):
+                return dt
+
+        return None
+
+    # Binary search to within a small block before start_time
+    lo, hi = 0, fp.seek(0, os.SEEK_END)
+    while hi - lo > SEEKSIZE:
+        mid = (lo + hi) // 2
+        dt = get_next_time(mid)
+        if dt and dt < start_time:
+            lo = mid
+        else:
+            hi = mid
+
+    # Then scan forward to position after last timed line before start_time
+    fp.seek(lo)
+    if lo > 0:
+        fp.readline()
+
+    pos = fp.tell()
+    for lineb in fp:
+        if dt := line_time(lineb, parser):
+            if dt >= start_time:
+                break
+            pos = fp.tell()
+
+    fp.seek(pos)
+
+
+def decode_line(lineb: bytes) -> str:
+    "Decode given log line, as UTF-8 unless it has escape sequences"
+    if b'\\' not in lineb:
+        try:
+            return lineb.decode()
+        except UnicodeDecodeError:
+            pass
+
+    # Interpret escape sequences, including a line continuation at the end
+    return (lineb + b'\n').decode('unicode_escape').removesuffix('\n')
+
+
+def decode_lines(data: bytes) -> list[str]:
+    "Decode given block of whole log lines, return list of lines"
+    # Log text is nearly always plain ASCII or UTF-8 which is decoded much
+    # faster all at once than a line at a time
+    lines = None
+    if b'\\' not in data:
+        try:
+            lines = data.decode().split('\n')
+        except UnicodeDecodeError:
+            pass
+
+    if lines is None:
+        lines = [decode_line(lineb) for lineb in data.split(b'\n')]
+
+    if not lines[-1]:
+        lines.pop()
+
+    return lines
+
+
+def read_blocks(fp: BinaryIO) -> Iterator[bytes]:
+    "Yield large blocks of whole lines from given binary file"
+    while data := fp.read(READSIZE):
+        yield data + fp.readline()
+
+
+def read_lines(fp: BinaryIO, marked: Callable | None = None) -> Iterator[str]:
+    "Yield decoded lines from given binary file, only marked lines if given"
+    for data in read_blocks(fp):
+        lines = decode_lines(data)
+        yield from marked(lines) if marked else lines
+
+
+def compile_markers(module: Module) -> Callable[[list[str]], list[str]] | None:
+    "Return function to quickly drop lines without any of the parser's markers"
+    if not (markers := module.markers):
+        return None
+
+    # A single substring test is much faster than a regex search, which in
+    # turn is much faster than testing each of several substrings
+    if len(markers) == 1:
+        marker = markers[0]
+        return lambda lines: [line for line in lines if marker in line]
+
+    search = re.compile('|'.join(re.escape(m) for m in markers)).search
+    return lambda lines: list(filter(search, lines))
+
+
+class Prefilter:
+    "Skip log lines which can not match any package, unless their times are needed"
+
+    # Changes are split where logged times are more than timegap apart. So
+    # when grouping changes, the skipped lines after each line which may
+    # match are still kept for their times, unless one is more than timegap
+    # after the last. Changes are split there anyway, so the skipped lines
+    # until the next line which may match are not needed.
+
+    def __init__(
+        self, pattern: re.Pattern, module: Module, timegap: timedelta | None = None
+    ) -> None:
+        self.search = pattern.search
+        self.timed = timegap is not None
+        self.timegap = timegap or timedelta()
+        self.last: datetime | None = None  # time of last line checked
+        self.checking = self.timed  # while skipped lines may be needed
+        self.pending: list[str] = []  # skipped lines not yet checked
+        self.checked = 0  # lines parsed for their times
+        if self.timed:
+            # Use a separate parser instance to get times so that the state
+            # of the main parser is not disturbed
+            self.parser = module.module.Parser()
+
+    def check(self, lines: list[str]) -> bool:
+        "Return True if the times of given lines are all within timegap"
+        if stats:
+            # Lines are parsed again if kept, so are not counted here
+            stats.searching = True
+
+        self.checked += len(lines)
+        last, split = self.last, False
+        try:
+            for event in get_events(lines, self.parser):
+                if last and event[0] - last > self.timegap:
+                    split = True
+                last = event[0]
+        finally:
+            if stats:
+                stats.searching = False
+
+        self.last = last
+        return not split
+
+    def add(self, line: str) -> list[str]:
+        "Return lines kept given the next line, which may be none or many"
+        if self.search(line):
+            if not self.timed:
+                return [line]
+
+            lines, self.pending = self.pending, []
+            lines.append(line)
+            self.checking = True
+            return lines if self.check(lines) else [line]
+
+        if self.checking:
+            self.pending.append(line)
+            if len(self.pending) >= TICKLINES:
+                lines, self.pending = self.pending, []
+                if self.check(lines):
+                    return lines
+
+                self.checking = False
+
+        return []
+
+    def flush(self) -> list[str]:
+        "Return any lines kept at the end"
+        lines, self.pending = self.pending, []
+        return lines if lines and self.check(lines) else []
+
+    def flush_all(self) -> list[str]:
+        "Return all lines not yet checked, when all lines are to be kept"
+        lines, self.pending = self.pending, []
+        return lines
+
+    def filter(self, lines: Iterable[str]) -> Iterator[str]:
+        "Yield given lines which are kept"
+        if not self.timed:
+            yield from filter(self.search, lines)
+            return
+
+        lines = iter(lines)
+        search, add = self.search, self.add
+        for num, line in enumerate(lines, 1):
+            if self.checking or search(line):
+                yield from add(line)
+                if num >= TICKCHECK and self.checked * 2 > num:
+                    yield from self.flush_all()
+                    yield from lines
+                    return
+
+        yield from self.flush()
+
+    def lines(self, lines: Iterable[str]) -> Iterator[str]:
+        "Yield given lines which are kept, counting others if collecting stats"
+        return stats.prefiltered(lines, self.filter) if stats else self.filter(lines)
+
+
+def scan_log(fp: BinaryIO, scan: bytes, prefilter: Prefilter) -> Iterator[str]:
+    "Yield lines kept by prefilter from given uncompressed log, which contain scan"
+    import mmap
+
+    # Search the memory mapped file so that lines which do not match are
+    # never copied or decoded
+    pos = fp.tell()
+    try:
+        buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        yield from prefilter.lines(read_lines(fp))
+        return
+
+    with buf:
+        find, rfind = buf.find, buf.rfind
+
+        # Lines with escape sequences may decode to match, so just read
+        # all lines of the rare log which has them
+        if find(b'\\', pos) >= 0:
+            yield from prefilter.lines(read_lines(fp))
+            return
+
+        begin, count, checked = pos, 0, 0
+        while (found := find(scan, pos)) >= 0:
+            start = rfind(b'\n', 0, found) + 1
+            if (end := find(b'\n', found)) < 0:
+                end = len(buf)
+
+            yield from prefilter.add(decode_line(buf[start:end]))
+            pos = end + 1
+
+            # Read following lines while the prefilter may need their times
+            while prefilter.checking and pos < len(buf):
+                if (end := find(b'\n', pos)) < 0:
+                    end = len(buf)
+
+                if scan in (lineb := buf[pos:end]):
+                    break
+
+                yield from prefilter.add(decode_line(lineb))
+                checked += end + 1 - pos
+                pos = end + 1
+
+            # If most lines match, or are read for their times, it is faster
+            # to read and decode them all
+            count += 1
+            scanned = pos - begin
+            if (
+                count == SCANCHECK
+                and scanned < SCANCHECK * SCANGAP
+                or checked * 2 > scanned >= SCANCHECK * SCANGAP
+            ):
+                fp.seek(pos)
+                yield from prefilter.lines(read_lines(fp))
+                return
+
+        yield from prefilter.flush()
+
+
+def read_log(
+    path: Path,
+    module: Module,
+    start_time: datetime,
+    prefilter: Prefilter | None = None,
+    scan: bytes | None = None,
+) -> Iterator[str]:
+    "Yield lines from given log file, skipping those before start_time if possible"
+    # Lines are only those kept by any prefilter, which are also searched
+    # for directly if scan is given
+    if (marked := compile_markers(module)) and stats:
+        marked = stats.markers(marked)
+
+    with fileinput.hook_compressed(str(path), 'rb') as fp:
+        if (
+            module.stateless
+            and start_time > datetime.min
+            and path.suffix not in COMPRESSED
+        ):
+            # Use a separate parser instance to search so that the state of
+            # the main parser is not disturbed
+            seek_start(fp, module.module.Parser(), start_time)
+
+        if prefilter and scan and path.suffix not in COMPRESSED:
+            lines = scan_log(fp, scan, prefilter)  # type: ignore
+            yield from stats.iterate('scan', lines) if stats else lines
+            return
+
+        if stats:
+            decode = stats.timer('decode', decode_lines)
+            blocks = stats.read(path, fp, read_blocks(fp))  # type: ignore
+            lines = chain.from_iterable(
+                marked(decode(data)) if marked else decode(data) for data in blocks
+            )
+        else:
+            lines = read_lines(fp, marked)  # type: ignore
+
+        yield from prefilter.lines(lines) if prefilter else lines
+
+
+def get_line_events(lines: Iterable[str], parser) -> Iterator[tuple]:
+    "Parse log lines using the parser's per line get_time/get_packages methods"
+    for line in lines:
+        if not (line := line.strip()):
+            continue
+
+        if not (dt := parser.get_time(line)):
+            continue
+
+        found = False
+        for fields in parser.get_packages():
+            if fields and len(fields) == 3 and fields[0] in ACTIONS:
+                found = True
+                yield dt, *fields
+
+        # A timed line without any package change is still yielded, with
+        # no action, since it affects how changes are grouped
+        if not found:
+            yield dt, '', '', ''
+
+
+def get_events(lines: Iterable[str], parser) -> Iterator[tuple]:
+    "Parse given log lines, return (time, action, package, version) events"
+    # Use the parser's batch method if it has one
+    if parse_lines := getattr(parser, 'parse_lines', None):
+        return parse_lines(lines)
+
+    return get_line_events(lines, parser)
+
+
+def parse_file(
+    path: Path, parser, offset: int = 0, marked: Callable | None = None
+) -> tuple[list, int]:
+    "Return all events in given log file from offset, and offset parsed to"
+    if path.suffix in COMPRESSED:
+        with fileinput.hook_compressed(str(path), 'rb') as fp:
+            events = get_events(read_lines(fp, marked), parser)  # type: ignore
+            return list(events), 0
+
+    with path.open('rb') as fp:
+        fp.seek(offset)
+        data = fp.read()
+
+    # Leave any partially written last line until next time
+    data = data[: data.rfind(b'\n') + 1]
+    lines = decode_lines(data)
+    if marked:
+        lines = marked(lines)
+
+    return list(get_events(lines, parser)), offset + len(data)
+
+
+def parse_job(
+    modpath: Path,
+    path: Path,
+    start_time: datetime,
+    pattern: re.Pattern | None,
+    scan: bytes | None,
+    timegap: timedelta | None,
+) -> list:
+    "Process pool job to parse all events from a log file"
+    module = Module(modpath)
+    prefilter = Prefilter(pattern, module, timegap) if pattern else None
+    lines = read_log(path, module, start_time, prefilter, scan)
+    return list(get_events(lines, module.module.Parser()))
+
+
+def read_job(modpath: Path, path: Path) -> str:
+    "Process pool job to decompress and decode all marked text from a log file"
+    marked = compile_markers(Module(modpath))
+    with fileinput.hook_compressed(str(path), 'rb') as fp:
+        return '\n'.join(read_lines(fp, marked))  # type: ignore
+
+
+def read_events(
+    filelist: list[Path],
+    module: Module,
+    start_time: datetime,
+    pattern: re.Pattern | None,
+    cache,
+    jobs: int,
+    follow: Callable[[Path, BinaryIO], Iterator[bytes]] | None = None,
+    scan: bytes | None = None,
+    timegap: timedelta | None = None,
+) -> Iterator[tuple]:
+    "Yield events from given list of time sequenced log files"
+    # Lines which can not match are skipped if a prefilter pattern is
+    # given, and if timegap is given, except those still needed to group
+    # changes split where more than timegap apart
+    parser = module.module.Parser()
+    prefilter = partial(Prefilter, pattern, module, timegap) if pattern else None
+    parse = stats.parser(get_events) if stats else get_events
+    parse_cached = partial(parse_file, marked=compile_markers(module))
+
+    # Rotated files before start_time need not be read at all. Cached
+    # files are not skipped so that they remain in the cache.
+    if module.stateless and start_time > datetime.min and not cache:
+        filelist = skip_files(filelist, module, start_time)
+
+    # Last file is followed for new lines so is read separately below
+    if follow:
+        filelist, live = filelist[:-1], filelist[-1]
+
+    if jobs > 1 and len(filelist) > 1 and not cache:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(min(jobs, len(filelist))) as pool:
+            if module.stateless:
+                # Each file can be parsed independently
+                events = chain.from_iterable(
+                    pool.map(
+                        parse_job,
+                        repeat(module.path),
+                        filelist,
+                        repeat(start_time),
+                        repeat(pattern),
+                        repeat(scan),
+                        repeat(timegap),
+                    )
+                )
+                yield from stats.iterate('jobs', events) if stats else events
+            else:
+                # Parser state carries across files so we can only decompress
+                # and decode in parallel, and then parse in order here
+                texts = pool.map(read_job, repeat(module.path), filelist)
+                for text in stats.iterate('jobs', texts) if stats else texts:
+                    lines = text.split('\n')
+                    kept = prefilter().lines(lines) if prefilter else lines
+                    yield from parse(kept, parser)
+    else:
+        for path in filelist:
+            if cache:
+                events, parser = cache.events(path, parser, parse_cached)
+                yield from events
+            else:
+                filtered = prefilter() if prefilter else None
+                yield from parse(
+                    read_log(path, module, start_time, filtered, scan), parser
+                )
+
+        if cache:
+            cache.save()
+
+    if follow:
+        with live.open('rb') as fp:
+            if module.stateless and start_time > datetime.min:
+                seek_start(fp, module.module.Parser(), start_time)
+
+            blocks = follow(live, fp)
+            if stats:
+                blocks = stats.iterate('follow', blocks)
+
+            # Parse lines as soon as they are appended, since a parser may
+            # otherwise wait for more lines to parse them together
+            if (marked := compile_markers(module)) and stats:
+                marked = stats.markers(marked)
+
+            # Prefilter is kept across blocks as the live log is one stream
+            live_filter = prefilter() if prefilter else None
+            for data in blocks:
+                lines = decode_lines(data)
+                if marked:
+                    lines = marked(lines)
+                kept = live_filter.lines(lines) if live_filter else lines
+                yield from parse(kept, parser)
+
+
+def read_installed(
+    filelist: list[Path], module: Module, cache, until: datetime, jobs: int
+) -> Events:
+    "Return state of installed packages at given time, with all their changes"
+    if not cache:
+        state = Events()
+        for event in read_events(filelist, module, datetime.min, None, None, jobs):
+            if event[0] > until:
+                break
+            if event[1]:
+                state.append(event)
+
+        return state
+
+    from pickle import dumps, loads
+
+    from .cache import Checkpoint
+
+    # Replay changes from the latest checkpoint saved before the given
+    # time, skipping the events of each file read to reach it
+    if checkpoint := cache.checkpoint(filelist, until):
+        state = loads(checkpoint.state)
+        skip = [file[3] for file in checkpoint.files]
+        count = checkpoint.count
+    else:
+        state = Events()
+        skip = []
+        count = 0
+
+    parser = module.module.Parser()
+    parse_cached = partial(parse_file, marked=compile_markers(module))
+    # Position in each file read, else None once any is not cached since
+    # no checkpoint can then be saved
+    files: list[tuple] | None = []
+    dt = datetime.min
+    done = False
+    for num, path in enumerate(filelist):
+        # Remaining files are still read so they are kept in the cache
+        events, parser = cache.events(path, parser, parse_cached)
+        for index in range(skip[num] if num < len(skip) else 0, len(events)):
+            if done or events[index][0] > until:
+                done = True
+                break
+
+            if not events[index][1]:
+                continue
+
+            state.append(events[index])
+            dt = events[index][0]
+            count += 1
+            if count % CHECKPOINT == 0 and files is not None:
+                if position := cache.position(path, index + 1):
+                    state = state.prune()
+                    cache.add_checkpoint(
+                        count, Checkpoint([*files, position], count, dt, dumps(state))
+                    )
+
+        if files is not None:
+            if position := cache.position(path, len(events)):
+                files.append(position)
+            else:
+                files = None
+
+    # Also save a checkpoint at the end of the logs, replacing any previous
+    if not done and count % CHECKPOINT and files is not None:
+        if not checkpoint or count > checkpoint.count:
+            state = state.prune()
+            cache.add_checkpoint(-1, Checkpoint(files, count, dt, dumps(state)))
+
+    cache.save()
+    return state
+
+
+def compile_prefilter(
+    module: Module, packages: list[str], glob: bool = False, regex: bool = False
+) -> re.Pattern | None:
+    "Compile regex to quickly skip log lines which can not match any package"
+    import fnmatch
+
+    if module.keep_lines is None:
+        return None
+
+    pats = [r'^\s*' + re.escape(p) for p in module.keep_lines]
+    for pkg in packages:
+        if glob:
+            # Remove end anchor so pattern can match within the line
+            pats.append(re.sub(r'\\[Zz]$', '', fnmatch.translate(pkg)))
+        elif regex:
+            # Anchors and look arounds can not be matched within the line
+            if any(a in pkg for a in ('^', '$', '\\A', '\\Z', '\\b', '\\B', '(?')):
+                return None
+            pats.append(f'(?:{pkg})')
+        else:
+            pats.append(re.escape(pkg))
+
+    return re.compile('|'.join(pats))
+
+
+def get_scan(
+    module: Module, packages: list[str], glob: bool = False, regex: bool = False
+) -> bytes | None:
+    "Return bytes to find log lines which may match a single plain package name"
+    # Glob and regex patterns may match differently on undecoded bytes.
+    # Searching for more than one string is much slower, so is not done
+    # for more than one package, or for parsers which keep other lines.
+    if (
+        glob
+        or regex
+        or module.keep_lines != ()
+        or len(packages) != 1
+        or not packages[0].isascii()
+    ):
+        return None
+
+    return packages[0].encode()
+
+
+def select_actions(args: Namespace) -> list[str]:
+    "Return actions to select for given options"
+    actions = []
+    for action, (actcode, _) in ACTIONS.items():
+        if args.updated_only and actcode != 3:
+            continue
+        if (args.installed or args.installed_only) and actcode > 2:
+            continue
+        if args.installed_only and actcode > 1:
+            continue
+        actions.append(action)
+
+    return actions
+
+
+def compile_select(
+    packages: Iterable[str],
+    actions: Iterable[str] = (),
+    glob: bool = False,
+    regex: bool = False,
+) -> Callable[[str, str], bool] | None:
+    "Compile predicate to select events to output, given action and package"
+    import fnmatch
+
+    # No actions, or all of them, means any action
+    wanted = set(actions)
+    if wanted >= ACTIONS.keys():
+        wanted.clear()
+
+    if not (packages := list(packages)):
+        if not wanted:
+            return None
+        return lambda action, pkg: action in wanted
+
+    if not glob and not regex:
+        names = set(packages)
+        if not wanted:
+            return lambda action, pkg: pkg in names
+        return lambda action, pkg: action in wanted and pkg in names
+
+    pats = [fnmatch.translate(p) if glob else p for p in packages]
+    try:
+        search = re.compile('|'.join(f'(?:{p})' for p in pats)).search
+    except re.error:
+        # Patterns with global flags can not be combined
+        regexes = [re.compile(p) for p in pats]
+
+        def search(pkg: str) -> bool:  # type: ignore
+            return any(r.search(pkg) for r in regexes)
+
+    if not wanted:
+        return lambda action, pkg: bool(search(pkg))
+    return lambda action, pkg: action in wanted and bool(search(pkg))
+
+
+def get_files(pathlist: list[Path], logname: str) -> list[Path]:
+    "Return list of all log files, oldest first, in given paths"
+    filelist = []
+    for path in pathlist:
+        if path.is_dir():
+            files = list(path.glob(f'{logname}.*'))
+            files.sort(key=lambda x: int(re.sub(r'\D+', '', str(x)) or 0), reverse=True)
+            files.append(path / logname)
+        else:
+            files = [path]
+
+        if not files[-1].exists():
+            raise FileNotFoundError(f'{files[-1]} does not exist')
+
+        filelist.extend(files)
+
+    return filelist
+
+
+def open_cache(module: Module, pathlist: list[Path]):
+    "Open cache of events for given parser and log paths"
+    from .cache import Cache
+
+    ident = f'{module.path.resolve()}:{module.path.stat().st_mtime_ns}:'
+    ident += PATHSEP.join(str(p.resolve()) for p in pathlist)
+    return Cache(module.path.stem, ident)
+
+
+def find_log(hostdir: Path, module: Module) -> Path | None:
+    "Return directory of given parser's log in given host directory, if any"
+    # Log may be in a directory of the same name as on the host, e.g.
+    # apt/history.log, or directly in the host directory
+    logfile = module.logfile or Path(module.module.logfile)
+    for path in (hostdir / logfile.parent.name, hostdir):
+        if (path / logfile.name).exists():
+            return path
+
+    return None
+
+
+def find_hosts(root: Path, modules: dict, module: Module | None) -> list[tuple]:
+    "Return name, parser module, and log directory of each host under root"
+    if not root.is_dir():
+        sys.exit(f'ERROR: {root} is not a directory.')
+
+    hosts = []
+    for hostdir in sorted(root.iterdir()):
+        if not hostdir.is_dir() or hostdir.name.startswith('.'):
+            continue
+
+        # Use given parser, else the first which finds its log
+        for mod in [module] if module else [modules[m] for m in sorted(modules)]:
+            if logdir := find_log(hostdir, mod):
+                hosts.append((hostdir.name, mod, logdir))
+                break
+        else:
+            print(f'Warning: no log found for host {hostdir.name}.', file=sys.stderr)
+
+    if not hosts:
+        sys.exit(f'ERROR: No host logs found in {root}.')
+
+    return hosts
+
+
+def host_job(
+    modpath: Path, logdir: Path, args: Namespace, start_time: datetime
+) -> list:
+    "Process pool job to return selected events from the logs of a host"
+    from .api import Log, installed_net
+
+    log = Log([logdir], Module(modpath), args.cache)
+    events = log.events(
+        start_time,
+        packages=args.package,
+        actions=select_actions(args),
+        glob=args.glob,
+        regex=args.regex,
+    )
+    if args.installed_net:
+        return list(installed_net(events, args.installed_net_days))
+
+    return list(events)
+
+
+def read_hosts(hosts: list[tuple], args: Namespace, start_time: datetime) -> Iterator:
+    "Yield (time, host, action, package, version) from all hosts, in time order"
+    import heapq
+    from concurrent.futures import ProcessPoolExecutor
+
+    def tag(host: str, events: list) -> Iterator[tuple]:
+        for dt, action, pkg, vers in events:
+            yield dt, host, action, pkg, vers
+
+    jobs = min(args.jobs or os.cpu_count() or 1, len(hosts))
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = [
+            (host, pool.submit(host_job, mod.path, logdir, args, start_time))
+            for host, mod, logdir in hosts
+        ]
+
+        # Events of each host are in time order, so merge them in order
+        yield from heapq.merge(*(tag(host, f.result()) for host, f in futures))
+
+
+def report_hosts(
+    args: Namespace, hosts: list[tuple], start_time: datetime, timegap: timedelta
+) -> None:
+    "Output selected events from all hosts, with host column"
+    hostlen = max(len(host) for host, *_ in hosts)
+    events = read_hosts(hosts, args, start_time)
+    if stats:
+        events = stats.iterate('jobs', events)
+
+    dt_out = datetime.max
+    for dt, host, action, pkg, vers in events:
+        if Queue.format:
+            Queue.format.host_event(host, dt, action, pkg, vers)
+            Queue.write()
+            continue
+
+        if dt - dt_out > timegap:
+            Queue.output(args)
+
+        dt_out = dt
+        Queue.queue.append((dt, action, f'{host:{hostlen}} {pkg}', vers))
+
+
+def parse_datetime(timestr: str) -> datetime | None:
+    "Parse given YYYY-MM-DD[?HH:MM[:SS]] time, or HH:MM[:SS] today"
+    # If no day is included then prepend today
+    if '-' not in timestr:
+        timestr = date.today().isoformat() + ' ' + timestr
+    try:
+        return datetime.fromisoformat(timestr)
+    except Exception:
+        return None
 
 
 def compute_start_time(args: Namespace) -> datetime | None:
@@ -167,12 +1263,7 @@ def compute_start_time(args: Namespace) -> datetime | None:
             try:
                 days = int(timestr)
             except Exception:
-                # If no day is included then prepend today
-                if '-' not in timestr:
-                    timestr = date.today().isoformat() + ' ' + timestr
-                try:
-                    start_time = datetime.fromisoformat(timestr)
-                except Exception:
+                if not (start_time := parse_datetime(timestr)):
                     sys.exit(f'ERROR: Can not parse days value "{args.days}".')
 
         elif not args.package:
@@ -186,14 +1277,8 @@ def compute_start_time(args: Namespace) -> datetime | None:
 
 
 def main() -> None:
-    def_module = ''
-    modules = {}
-
-    # Load all parser modules
-    for m in (MODDIR / 'parsers').glob('[!_]*.py'):
-        modules[m.stem] = mod = Module(m)
-        if not def_module and mod.logfile.exists():
-            def_module = m.stem
+    global stats
+    modules, def_module = find_modules()
 
     # Process command line options
     opt = ArgumentParser(
@@ -213,6 +1298,13 @@ def main() -> None:
     grp.add_argument(
         '-n', '--installed-net', action='store_true', help='show net installed only'
     )
+    grp.add_argument(
+        '-A',
+        '--at',
+        metavar='DATE',
+        help='show installed packages, with their install time and version, '
+        'as at given YYYY-MM-DD[?HH:MM[:SS]]',
+    )
     opt.add_argument(
         '-N',
         '--installed-net-days',
@@ -299,6 +1391,64 @@ def main() -> None:
         action='store_true',
         help='just list available parsers and their descriptions',
     )
+    opt.add_argument(
+        '-C',
+        '--cache',
+        action='store_true',
+        help='cache parsed log events to speed up subsequent runs',
+    )
+    opt.add_argument(
+        '-J',
+        '--jobs',
+        type=int,
+        help='number of parallel processes used to read multiple log '
+        'files, default=1. Not used with --cache. With --hosts, the number '
+        'of hosts read in parallel, default=number of CPUs.',
+    )
+    opt.add_argument(
+        '-F',
+        '--follow',
+        action='store_true',
+        help='after reporting, continue to wait for and report new '
+        'changes as they are logged',
+    )
+    opt.add_argument(
+        '-o',
+        '--format',
+        choices=('text', 'json', 'ndjson', 'csv'),
+        default='text',
+        help='output format, default=%(default)s. Other formats output each '
+        'change as a record, as soon as read.',
+    )
+    opt.add_argument(
+        '-H',
+        '--hosts',
+        metavar='DIR',
+        help='report changes from the logs of many hosts, merged in time '
+        'order with a host column. Each host has its own sub directory of '
+        'logs in DIR. The parser for each host is found from its log file '
+        'names, unless given.',
+    )
+    grp = opt.add_mutually_exclusive_group()
+    grp.add_argument(
+        '--serve',
+        metavar='SOCKET',
+        help='keep all changes in memory, following the log for new ones, '
+        'and answer queries from --connect clients on given Unix socket path',
+    )
+    grp.add_argument(
+        '--connect',
+        metavar='SOCKET',
+        help='report changes from a --serve server on given Unix socket '
+        'path, instead of reading the log',
+    )
+    opt.add_argument(
+        '-S',
+        '--stats',
+        action='store_true',
+        help='report time taken and counts for each stage of processing to '
+        f'stderr on exit. Can also be enabled by setting ${STATSENV}.',
+    )
     opt.add_argument(
         '-V', '--version', action='store_true', help=f'just show {opt.prog} version'
     )
@@ -308,13 +1458,15 @@ def main() -> None:
     # command line.
     cnffile = CNFFILE.expanduser()
     if cnffile.exists():
+        import shlex
+
         with cnffile.open() as fp:
             cnflinesl = [re.sub(r'#.*$', '', line).strip() for line in fp]
-        cnflines = ' '.join(cnflinesl).strip()
+        cnfargs = shlex.split(' '.join(cnflinesl).strip())
     else:
-        cnflines = ''
+        cnfargs = []
 
-    args = opt.parse_args(shlex.split(cnflines) + sys.argv[1:])
+    args = opt.parse_args(cnfargs + sys.argv[1:])
 
     if args.version:
         from importlib.metadata import version
@@ -330,11 +1482,17 @@ def main() -> None:
     if args.list_parsers:
         for name in sorted(modules):
             mod = modules[name]
-            desc = mod.module.__doc__ or 'No description available.'
+            desc = mod.desc or 'No description available.'
             print(f'{name}\t: {desc}')
         return
 
-    Queue.no_color = args.no_color or not sys.stdout.isatty()
+    if args.stats or os.getenv(STATSENV):
+        import atexit
+
+        from .stats import Stats
+
+        stats = Stats()
+        atexit.register(stats.report)
 
     if args.parser_plugin:
         # Get alternate custom parser file
@@ -345,99 +1503,161 @@ def main() -> None:
             sys.exit(f'ERROR: "{path}" must be an existing python file')
 
         module: Module | None = Module(path)
+    elif args.hosts and not args.parser:
+        # Parser is found for each host
+        module = None
     else:
         # Get parser specified on command line or default parser
         module = modules.get(args.parser or def_module)
 
-    if not module:
+    if args.hosts:
+        if args.boot or args.follow or args.path:
+            sys.exit('ERROR: Can not use --boot, --follow, or --path with --hosts.')
+    elif not module and not args.connect:
         sys.exit('ERROR: Can not determine log parser for this system.')
 
-    if args.package:
-        pkgs = []
-        for pkg in args.package:
-            # Convert glob pattern to regex
-            if args.glob:
-                pkg = fnmatch.translate(pkg)
-                args.regex = True
+    if module and not args.connect:
+        try:
+            module.load()
+        except ValueError as e:
+            sys.exit(f'ERROR: {e}.')
+
+    if (args.serve or args.connect) and (args.hosts or args.follow):
+        sys.exit('ERROR: Can not use --follow or --hosts with --serve or --connect.')
 
-            # Store compiled regex for package name
-            if args.regex:
-                pkg = re.compile(pkg)
+    if args.at:
+        if args.hosts or args.follow or args.days or args.boot:
+            sys.exit(
+                'ERROR: Can not use --days, --boot, --follow, or --hosts with --at.'
+            )
+        if not (until := parse_datetime(args.at)):
+            sys.exit(f'ERROR: Can not parse at value "{args.at}".')
 
-            pkgs.append(pkg)
+        # Only installed packages are shown
+        args.installed = True
+        args.alldays = True
 
-        args.package = pkgs
+    if stats and module:
+        stats.wrap_module(module.module)
 
     if args.installed_net:
         args.installed = True
-        Queue.installed_net_days = timedelta(days=args.installed_net_days)
-
-    if not args.package and not (args.installed or args.installed_only):
-        Queue.delim = 80 * '-'
 
     timegap = timedelta(minutes=args.timegap)
     dt_out = datetime.max
     start_time = compute_start_time(args) or datetime.min
 
-    # Get last boot time
-    upsecs = float(Path('/proc/uptime').read_text().split()[0])
-    Queue.boottime = datetime.now() - timedelta(seconds=upsecs)
+    # Color each line if output is to a terminal
+    color = not args.no_color and sys.stdout.isatty()
+    if args.connect:
+        from .serve import connect
+
+        connect(Path(args.connect), args, color)
+        return
 
-    if not args.package and not args.boot:
-        timestr = Queue.boottime.isoformat(' ', 'seconds')
-        Queue.bootstr = f'{timestr} ### LAST SYSTEM BOOT ###'
+    Queue.setup(args, color)
+    if stats:
+        # Wrap output stages to time them
+        for name in ('output', 'write'):
+            setattr(Queue, name, stats.timer(name, getattr(Queue, name)))
+
+        if Queue.format:
+            event = stats.timer('format', Queue.format.event)
+            Queue.format.event = event  # type: ignore[method-assign]
+
+    # Uncompressed logs are searched directly for the earliest time we need
+    seek_time = max(start_time, Queue.boottime) if args.boot else start_time
+    if stats and seek_time > start_time:
+        stats.start_time = start_time
+
+    # Parser module is only not known here when reading many hosts
+    if args.hosts or not module:
+        hosts = find_hosts(Path(args.hosts), modules, module)
+        report_hosts(args, hosts, start_time, timegap)
+        Queue.finish(args)
+        return
 
-    # Instantiate the log parser
-    log_parser = module.module.Parser()
+    from .api import Log
 
-    defpath = module.logfile
+    if args.installed_net and args.follow:
+        sys.exit('ERROR: Can not follow net installed packages.')
 
-    if args.path:
-        pathlist = [Path(p) for p in args.path.split(PATHSEP)]
-    else:
-        pathlist = [defpath.parent]
+    pathlist = [Path(p) for p in args.path.split(PATHSEP)] if args.path else None
+    log = Log(pathlist, module, args.cache, args.jobs or 1)
+    try:
+        log.files()
+    except FileNotFoundError as e:
+        sys.exit(f'ERROR: {e}.')
 
-    # Loop over all lines in input files
-    for path in pathlist:
-        if path.is_dir():
-            filelist = list(path.glob(f'{defpath.name}.*'))
-            filelist.sort(
-                key=lambda x: int(re.sub(r'\D+', '', str(x)) or 0), reverse=True
-            )
-            filelist.append(path / defpath.name)
-        else:
-            filelist = [path]
+    if args.serve:
+        from .serve import serve
 
-        if not filelist[-1].exists():
-            sys.exit(f'ERROR: {filelist[-1]} does not exist.')
+        serve(Path(args.serve), log, timegap)
+        return
 
-        for lineb in fileinput.input(
-            filelist, openhook=fileinput.hook_compressed, encoding='unicode_escape'
-        ):
-            line = lineb if isinstance(lineb, str) else lineb.decode()
-            if not (line := line.strip()):
-                continue
+    query = {'packages': args.package, 'glob': args.glob, 'regex': args.regex}
 
-            if not (dt := log_parser.get_time(line)):
-                continue
+    if args.at:
+        Queue.queue = log.installed_at(until, **query)
+        Queue.finish(args)
+        return
 
-            if dt < start_time or args.boot and dt < Queue.boottime:
-                continue
+    # All net installed changes are output together
+    if args.installed_net:
+        days = args.installed_net_days
+        Queue.queue = list(log.installed_net(days, seek_time, **query))
+        Queue.finish(args)
+        return
 
-            if dt - dt_out > timegap and not args.installed_net:
+    if args.follow:
+        from .follow import follow_log
+
+        if (live := log.files()[-1]).suffix in COMPRESSED:
+            sys.exit(f'ERROR: Can not follow compressed {live}.')
+
+        def idle(quiet: bool) -> None:
+            "Output queued changes once log has been quiet, and flush output"
+            if quiet:
                 Queue.output(args)
 
-            dt_out = dt
+            Queue.write(flush=True)
 
-            for fields in log_parser.get_packages():
-                if fields and len(fields) == 3 and fields[0] in ACTIONS:
-                    Queue.append(dt, *fields)
+        follow = partial(follow_log, idle=idle, timeout=timegap.total_seconds())
+    else:
+        follow = None
+
+    # Loop over all events in input files. Other timed lines are included
+    # since they affect how changes are grouped.
+    events = log.events(
+        seek_time,
+        actions=select_actions(args),
+        ticks=True,
+        timegap=timegap,
+        follow=follow,
+        **query,
+    )
+    try:
+        for dt, action, pkg, vers in events:
+            if dt - dt_out > timegap:
+                Queue.output(args)
+
+            dt_out = dt
+            if action:
+                Queue.append(dt, action, pkg, vers)
+    except KeyboardInterrupt:
+        # Following is normally stopped by an interrupt
+        if not args.follow:
+            raise
 
     # Flush any remaining queued output
-    Queue.output(args)
-    if Queue.bootstr:
-        Queue.print(None, Queue.delim, Queue.bootstr)
+    Queue.finish(args)
 
 
 if __name__ == '__main__':
+    if not __package__:
+        # Run as a script, so run main() from this module within its
+        # package instead, for its relative imports
+        sys.path[0] = str(Path(__file__).resolve().parent.parent)
+        from pkglog.pkglog import main
+
     main()
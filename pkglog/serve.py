@@ -0,0 +1,414 @@
+"Serve queries of package changes kept in memory, over a Unix socket."
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+from argparse import Namespace
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
+from functools import partial
+from heapq import merge
+from itertools import count
+from pathlib import Path
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+
+from .pkglog import (
+    ACTION_CODES,
+    ACTIONS,
+    CHECKPOINT,
+    COMPRESSED,
+    EPOCH,
+    TYPE_CHECKING,
+    USEC,
+    Events,
+    Queue,
+    compile_select,
+    compute_start_time,
+    parse_datetime,
+    select_actions,
+)
+
+if TYPE_CHECKING:
+    from .api import Log
+
+# Options which a client sends with each query, i.e. all those which
+# select and format the changes output
+OPTIONS = (
+    'updated_only',
+    'installed',
+    'installed_only',
+    'installed_net',
+    'at',
+    'installed_net_days',
+    'days',
+    'alldays',
+    'boot',
+    'nojustify',
+    'verbose',
+    'timegap',
+    'glob',
+    'regex',
+    'format',
+    'package',
+)
+
+# Read replies from the server in blocks of this many bytes
+READSIZE = 64 * 1024
+
+
+class Store:
+    "All events read from a log, indexed to quickly select changes"
+
+    def __init__(self) -> None:
+        self.times = array('q')  # microseconds since EPOCH of each event
+        self.changes = Events()
+        self.lines = array('L')  # index in times of each change
+        self.packages: dict[str, array] = {}  # index of each package change
+        self.gaps: dict[int, tuple[array, int]] = {}
+        self.strings: list[str] = []
+        self.checkpoints: list[dict[str, int]] = [{}]  # installed state
+        self.pruned: Events | None = None
+        self.lock = threading.Lock()
+
+    def append(self, event: tuple[datetime, str, str, str]) -> None:
+        "Append given event, which is just a time if it is not a change"
+        dt, action, pkg, _ = event
+        with self.lock:
+            if action:
+                # Save installed state before each CHECKPOINT changes
+                changes = self.changes
+                if (num := len(changes)) and num % CHECKPOINT == 0:
+                    self.checkpoints.append(changes.installed.copy())
+
+                if (ids := self.packages.get(pkg)) is None:
+                    ids = self.packages[pkg] = array('L')
+
+                ids.append(num)
+                self.lines.append(len(self.times))
+                changes.append(event)
+                self.pruned = None
+
+            self.times.append((dt - EPOCH) // USEC)
+
+    def get_gaps(self, timegap: timedelta) -> array:
+        "Return index of each event which is more than timegap after the last"
+        # Found once for each timegap queried, then only for new events
+        usecs = timegap // USEC
+        gaps, done = self.gaps.get(usecs, (array('L'), 1))
+        times = self.times[done - 1 :]
+        pairs = zip(count(done), times, times[1:])
+        gaps.extend(n for n, a, b in pairs if b - a > usecs)
+        self.gaps[usecs] = gaps, max(len(self.times), 1)
+        return gaps
+
+    def select(
+        self,
+        since: datetime,
+        packages: list[str],
+        actions: Iterable[str],
+        glob: bool = False,
+        regex: bool = False,
+    ) -> Iterator[int]:
+        "Yield index of each selected change from given time, in time order"
+        changes = self.changes
+        first = bisect_left(changes.times, (since - EPOCH) // USEC)
+        if packages:
+            # Only the changes of each matching package are looked at
+            if glob or regex:
+                select = compile_select(packages, (), glob, regex)
+                names = [p for p in self.packages if select and select('', p)]
+            else:
+                names = [p for p in dict.fromkeys(packages) if p in self.packages]
+
+            lists = [self.packages[name] for name in names]
+            indices: Iterable[int] = merge(
+                *(ids[bisect_left(ids, first) :] for ids in lists)
+            )
+        else:
+            indices = range(first, len(changes))
+
+        codes = {ACTION_CODES[a] for a in actions}
+        if len(codes) < len(ACTIONS):
+            acts = changes.actions
+            indices = (n for n in indices if acts[n] in codes)
+
+        yield from indices
+
+    def get_strings(self) -> list[str]:
+        "Return all package names and versions, in order of their ids"
+        if len(self.strings) != len(ids := self.changes.ids):
+            self.strings = list(ids)
+
+        return self.strings
+
+    def get_changes(self, indices: Iterable[int]) -> Iterator[tuple]:
+        "Yield change at each given index"
+        changes = self.changes
+        strings = self.get_strings()
+        actions = list(ACTIONS)
+        for n in indices:
+            yield (
+                EPOCH + changes.times[n] * USEC,
+                actions[changes.actions[n]],
+                strings[changes.pkgs[n]],
+                strings[changes.vers[n]],
+            )
+
+    def transactions(
+        self,
+        since: datetime,
+        packages: list[str],
+        actions: Iterable[str],
+        timegap: timedelta,
+        glob: bool = False,
+        regex: bool = False,
+    ) -> list[list[tuple]]:
+        "Return selected changes, split in lists where logged times are apart"
+        # Changes are split in the same places as when reading the log,
+        # where any other events between them are also more than timegap
+        # apart
+        with self.lock:
+            gaps = self.get_gaps(timegap)
+            indices = list(self.select(since, packages, actions, glob, regex))
+            groups: list[list[tuple]] = []
+            last = -1
+            for n, change in zip(indices, self.get_changes(indices)):
+                line = self.lines[n]
+                gap = bisect_right(gaps, last)
+                if not groups or gap < len(gaps) and gaps[gap] <= line:
+                    groups.append([])
+
+                groups[-1].append(change)
+                last = line
+
+        return groups
+
+    def installed_net(
+        self,
+        days: float,
+        since: datetime,
+        packages: list[str],
+        glob: bool = False,
+        regex: bool = False,
+    ) -> list[tuple]:
+        "Return install of each package still installed, from since, in time order"
+        actions = ('installed', 'removed')
+        with self.lock:
+            if since > datetime.min:
+                state = Events()
+                indices = self.select(since, packages, actions, glob, regex)
+                for change in self.get_changes(indices):
+                    state.append(change)
+            else:
+                # Only changes of still installed packages are kept, until
+                # the next change
+                if self.pruned is None:
+                    self.pruned = self.changes.prune()
+
+                select = compile_select(packages, actions, glob, regex)
+                state = self.pruned.prune(select)
+
+            return list(state.installed_net(timedelta(days=days)))
+
+    def installed_at(
+        self,
+        until: datetime,
+        packages: list[str],
+        glob: bool = False,
+        regex: bool = False,
+    ) -> list[tuple]:
+        "Return install of each package installed at given time, with its version"
+        with self.lock:
+            changes = self.changes
+            strings = self.get_strings()
+            stop = bisect_right(changes.times, (until - EPOCH) // USEC)
+
+            # Replay changes from the latest checkpoint before the time
+            num = min(stop // CHECKPOINT, len(self.checkpoints) - 1)
+            installed = self.checkpoints[num].copy()
+            codes = [actcode for actcode, _ in ACTIONS.values()]
+            for n in range(num * CHECKPOINT, stop):
+                actcode = codes[changes.actions[n]]
+                if actcode == 1:
+                    installed[strings[changes.pkgs[n]]] = changes.times[n]
+                elif actcode == 2:
+                    installed.pop(strings[changes.pkgs[n]], None)
+
+            select = compile_select(packages, (), glob, regex)
+            events = []
+            for name, t in sorted(installed.items(), key=lambda x: x[1]):
+                if select and not select('installed', name):
+                    continue
+
+                # Version is that of the last change before the time
+                ids = self.packages[name]
+                vers = strings[changes.vers[ids[bisect_left(ids, stop) - 1]]]
+                vers = vers.rsplit(' -> ', 1)[-1]
+                events.append((EPOCH + t * USEC, 'installed', name, vers))
+
+            return events
+
+
+def query(store: Store, args: Namespace, boottime: datetime) -> list[list[tuple]]:
+    "Return changes selected by given client options, in groups to output"
+    start_time = compute_start_time(args) or datetime.min
+    seek_time = max(start_time, boottime) if args.boot else start_time
+    packages = args.package
+    if args.at:
+        if not (until := parse_datetime(args.at)):
+            sys.exit(f'ERROR: Can not parse at value "{args.at}".')
+
+        return [store.installed_at(until, packages, args.glob, args.regex)]
+
+    if args.installed_net:
+        days = args.installed_net_days
+        return [store.installed_net(days, seek_time, packages, args.glob, args.regex)]
+
+    timegap = timedelta(minutes=args.timegap)
+    actions = select_actions(args)
+    return store.transactions(
+        seek_time, packages, actions, timegap, args.glob, args.regex
+    )
+
+
+class Handler(StreamRequestHandler):
+    "Answer a query from a client"
+
+    server: Server
+
+    def setup(self) -> None:
+        super().setup()
+        # Output state of this client only, as others may be answered at once
+        self.queue = Queue.new()
+
+    def reply(self, status: dict) -> None:
+        self.wfile.write(json.dumps(status).encode() + b'\n')
+
+    def handle(self) -> None:
+        if not (request := self.rfile.readline()):
+            return
+
+        queue = self.queue
+        try:
+            options = json.loads(request)
+            args = Namespace(hosts=None, **options['args'])
+            queue.setup(args, options['color'])
+            groups = query(self.server.store, args, queue.boottime)
+        except SystemExit as e:
+            self.reply({'error': str(e.code)})
+            return
+        except Exception as e:
+            self.reply({'error': f'ERROR: {e}'})
+            return
+
+        self.reply({})
+        out = self.connection.makefile('w', encoding='utf-8', errors='replace')
+        queue.out = out
+        try:
+            for changes in groups:
+                for change in changes:
+                    queue.append(*change)
+
+                queue.output(args)
+
+            queue.finish(args)
+        except OSError:
+            # Client has gone
+            pass
+        finally:
+            queue.out = None
+            try:
+                out.close()
+            except OSError:
+                pass
+
+
+class Server(ThreadingUnixStreamServer):
+    "Unix socket server of queries on given store of events"
+
+    # Answer each client in its own thread, so a slow reader (e.g. a
+    # pager) does not hold up others
+    daemon_threads = True
+
+    def __init__(self, path: Path, store: Store) -> None:
+        self.store = store
+        super().__init__(str(path), Handler)
+
+
+def serve(path: Path, log: Log, timegap: timedelta) -> None:
+    "Read all events of given log, then follow it and answer queries"
+    from .follow import follow_log
+
+    if (live := log.files()[-1]).suffix in COMPRESSED:
+        sys.exit(f'ERROR: Can not follow compressed {live}.')
+
+    # Replace socket left by a previous server, unless it is still running
+    if path.is_socket():
+        with socket.socket(socket.AF_UNIX) as sock:
+            try:
+                sock.connect(str(path))
+            except OSError:
+                path.unlink()
+            else:
+                sys.exit(f'ERROR: {path} is already being served.')
+
+    # Clients can connect as soon as the socket exists, but are not
+    # answered until all events have been read
+    store = Store()
+    server = Server(path, store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+
+    def idle(quiet: bool) -> None:
+        "Start answering queries once all logged events have been read"
+        if not thread.ident:
+            thread.start()
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit())
+    follow = partial(follow_log, idle=idle, timeout=timegap.total_seconds())
+    try:
+        for event in log.events(ticks=True, follow=follow):
+            store.append(event)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if thread.ident:
+            server.shutdown()
+
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+def connect(path: Path, args: Namespace, color: bool) -> None:
+    "Send given options as a query to server, and write its reply"
+    request = {'args': {name: getattr(args, name) for name in OPTIONS}, 'color': color}
+    with socket.socket(socket.AF_UNIX) as sock:
+        try:
+            sock.connect(str(path))
+        except OSError as e:
+            sys.exit(f'ERROR: Can not connect to {path}: {e.strerror}.')
+
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as fp:
+            if not (status := fp.readline()):
+                sys.exit(f'ERROR: No reply from {path}.')
+
+            if error := json.loads(status).get('error'):
+                sys.exit(error)
+
+            out = sys.stdout.buffer
+            try:
+                while data := fp.read1(READSIZE):
+                    out.write(data)
+
+                out.flush()
+            except BrokenPipeError:
+                # Reader has gone (e.g. pager quit) so stop immediately
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                sys.exit(1)
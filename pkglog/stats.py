@@ -0,0 +1,266 @@
+"Collect and report timings and counts for each stage of processing."
+
+from __future__ import annotations
+
+import sys
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from time import perf_counter
+
+from .pkglog import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from datetime import datetime
+    from typing import BinaryIO
+
+# Description of each timed stage, in the order reported. The time of
+# each stage excludes the time of any other stage called from within it.
+STAGES = {
+    'read': 'read and decompress log files',
+    'decode': 'decode log lines',
+    'scan': 'search uncompressed logs for package lines',
+    'markers': 'skip lines without parser markers',
+    'prefilter': 'skip lines which can not match packages',
+    'parse': 'parse lines to events',
+    'get_time': 'parser get_time() calls',
+    'get_packages': 'parser get_packages() calls',
+    'timestamp': 'parse timestamps',
+    'jobs': 'wait for parallel jobs',
+    'cache': 'read cached events, and parse new lines',
+    'follow': 'wait for and read followed log',
+    'select': 'select changes by action and package',
+    'output': 'group and format output lines',
+    'format': 'format output records',
+    'write': 'write output',
+}
+
+# Counts, in the order reported
+COUNTS = (
+    'lines parsed',
+    'lines skipped by markers',
+    'lines skipped by prefilter',
+    'lines without timestamp',
+    'lines without events',
+    'timed lines without changes',
+    'changes',
+    'changes before start time',
+    'changes before boot',
+    'changes filtered by action',
+    'changes filtered by package',
+)
+
+
+class Stats:
+    "Time and count each stage of processing, and report on exit"
+
+    def __init__(self) -> None:
+        self.start = perf_counter()
+        self.times: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.counts: Counter[str] = Counter()
+        self.files: dict[str, list[int]] = {}  # bytes skipped, bytes, lines
+        self.nested = 0.0
+        self.lineno = 0
+        self.wrapped: set[int] = set()
+        self.searching = False  # looking up times to search logs
+        self.start_time: datetime | None = None  # if before boot time
+
+    def timer(self, name: str, func: Callable) -> Callable:
+        "Return given function wrapped to add its time to the named stage"
+        times = self.times
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            outer, self.nested = self.nested, 0.0
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                times[name] += elapsed - self.nested
+                self.nested = outer + elapsed
+
+        return timed
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        "Yield from given iterable, adding the time to get each to the named stage"
+        getnext = self.timer(name, iter(iterable).__next__)
+        while True:
+            try:
+                item = getnext()
+            except StopIteration:
+                return
+            yield item
+
+    def read(self, path: object, fp: BinaryIO, blocks: Iterable[bytes]) -> Iterator:
+        "Yield given blocks read from log file, timing and counting them"
+        counts = self.files.setdefault(str(path), [0, 0, 0])
+        counts[0] += fp.tell()
+        for data in self.iterate('read', blocks):
+            counts[1] += len(data)
+            counts[2] += data.count(b'\n')
+            yield data
+
+    def prefiltered(self, lines: Iterable[str], prefilter: Callable) -> Iterator[str]:
+        "Yield given lines which the prefilter function keeps, counting others"
+        counts = self.counts
+
+        def read() -> Iterator[str]:
+            for line in lines:
+                counts['lines skipped by prefilter'] += 1
+                yield line
+
+        for line in self.iterate('prefilter', prefilter(read())):
+            counts['lines skipped by prefilter'] -= 1
+            yield line
+
+    def markers(self, marked: Callable) -> Callable[[list[str]], list[str]]:
+        "Return given marker filter, wrapped to time it and count lines skipped"
+        marked = self.timer('markers', marked)
+        counts = self.counts
+
+        def counted(lines: list[str]) -> list[str]:
+            kept = marked(lines)
+            counts['lines skipped by markers'] += len(lines) - len(kept)
+            return kept
+
+        return counted
+
+    def counted(self, lines: Iterable[str]) -> Iterator[str]:
+        "Yield given lines, counting each"
+        for line in lines:
+            self.lineno += 1
+            yield line
+
+    def wrap_parser(self, parser) -> None:
+        "Time calls to the per line methods of given parser instance"
+        if id(parser) in self.wrapped or not hasattr(parser, 'get_time'):
+            return
+
+        self.wrapped.add(id(parser))
+        counts = self.counts
+        get_time = self.timer('get_time', parser.get_time)
+        get_packages = parser.get_packages
+
+        def timed_get_time(line: str):
+            if not (dt := get_time(line)):
+                counts['lines without timestamp'] += 1
+            return dt
+
+        parser.get_time = timed_get_time
+        parser.get_packages = self.timer('get_packages', lambda: list(get_packages()))
+
+    def wrap_module(self, module) -> None:
+        "Time calls to timestamp functions imported by given parser module"
+        from . import timestamp
+
+        # Invalid time stamps are counted here for batch parsers, but by
+        # wrap_parser() for parsers which parse one line at a time
+        counted = hasattr(getattr(module, 'Parser', None), 'parse_lines')
+        counts = self.counts
+
+        def wrap(func: Callable) -> Callable:
+            timed = self.timer('timestamp', func)
+
+            def parse(dts: str):
+                if not (dt := timed(dts)) and not self.searching:
+                    counts['lines without timestamp'] += 1
+                return dt
+
+            return parse if counted else timed
+
+        funcs = {id(timestamp.parse_time), id(timestamp.parse_localtime)}
+        for name, value in list(vars(module).items()):
+            if id(value) in funcs:
+                setattr(module, name, wrap(value))
+
+    def parser(self, get_events: Callable) -> Callable[..., Iterator[tuple]]:
+        "Return given get_events() function, wrapped to time and count it"
+        counts = self.counts
+
+        def parse(lines: Iterable[str], parser) -> Iterator[tuple]:
+            if hasattr(parser, 'parse_lines'):
+                # Batch parsers may read many lines before yielding events
+                # from any of them, so lines with events can not be counted
+                events = get_events(self.counted(lines), parser)
+                yield from self.iterate('parse', events)
+                return
+
+            self.wrap_parser(parser)
+            events = get_events(self.counted(lines), parser)
+            last = self.lineno
+            for event in self.iterate('parse', events):
+                # Count each line an event is parsed from, but only once
+                if self.lineno != last:
+                    last = self.lineno
+                    counts['lines with events'] += 1
+                yield event
+
+        return parse
+
+    def before_start(self, dt: datetime) -> None:
+        "Count change skipped as before the start time, or before boot"
+        if self.start_time and dt >= self.start_time:
+            self.counts['changes before boot'] += 1
+        else:
+            self.counts['changes before start time'] += 1
+
+    def events(self, events: Iterable[tuple]) -> Iterator[tuple]:
+        "Yield given events, counting changes and timed lines without changes"
+        counts = self.counts
+        for event in events:
+            counts['changes' if event[1] else 'timed lines without changes'] += 1
+            yield event
+
+    def select(
+        self, select: Callable[[str, str], bool], by_action: Callable | None
+    ) -> Callable[[str, str], bool]:
+        "Return given select predicate, wrapped to count why changes are filtered"
+        select = self.timer('select', select)
+        counts = self.counts
+
+        def selected(action: str, pkg: str) -> bool:
+            if select(action, pkg):
+                return True
+
+            if by_action and not by_action(action, pkg):
+                counts['changes filtered by action'] += 1
+            else:
+                counts['changes filtered by package'] += 1
+            return False
+
+        return selected
+
+    def report(self) -> None:
+        "Write report of all timings and counts"
+        total = perf_counter() - self.start
+        counts = self.counts
+        if self.lineno:
+            counts['lines parsed'] = self.lineno
+
+        # Only counted for parsers which parse one line at a time
+        if self.wrapped:
+            counts['lines without events'] = self.lineno - counts['lines with events']
+
+        out = ['pkglog stats:']
+        if self.files:
+            out.append(f'  {"bytes skipped":>13} {"bytes read":>12} {"lines":>10} file')
+            for path, (skipped, nbytes, nlines) in self.files.items():
+                out.append(f'  {skipped:13} {nbytes:12} {nlines:10} {path}')
+
+        out.append(f'  {"secs":>9} stage')
+        for name, desc in STAGES.items():
+            if secs := self.times[name]:
+                out.append(f'  {secs:9.3f} {name}: {desc}')
+
+        other = total - sum(self.times.values())
+        out.append(f'  {other:9.3f} other: main loop, and grouping changes')
+        out.append(f'  {total:9.3f} total')
+
+        if names := [n for n in COUNTS if counts[n]]:
+            out.append(f'  {"count":>9} of')
+            out.extend(f'  {counts[n]:9} {n}' for n in names)
+
+        try:
+            sys.stderr.write('\n'.join(out) + '\n')
+            sys.stderr.flush()
+        except OSError:
+            pass
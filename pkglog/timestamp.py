@@ -0,0 +1,64 @@
+"Shared helpers for parsers to convert log time stamps to datetimes."
+
+from __future__ import annotations
+
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+# Consecutive log lines very often share the same time stamp
+CACHESIZE = 256
+
+# Local time zone offset is looked up once for each period of this many
+# seconds, since zone changes almost always occur on these boundaries
+ZONEPERIOD = 15 * 60
+
+
+def _fromisoformat(dts: str) -> datetime | None:
+    "Return datetime for ISO format string, or None if invalid"
+    try:
+        return datetime.fromisoformat(dts)
+    except Exception:
+        pass
+
+    # Python < 3.11 does not accept "Z" or a time zone without ":"
+    if sys.version_info < (3, 11):
+        dts = re.sub(r'([+-]\d\d)(\d\d)$', r'\1:\2', dts.replace('Z', '+00:00'))
+        try:
+            return datetime.fromisoformat(dts)
+        except Exception:
+            pass
+
+    return None
+
+
+@lru_cache(maxsize=CACHESIZE)
+def _local_zone(period: int) -> timezone | None:
+    "Return local time zone for given period, or None if it changes within it"
+    start = time.localtime(period * ZONEPERIOD).tm_gmtoff
+    end = time.localtime((period + 1) * ZONEPERIOD - 1).tm_gmtoff
+    return timezone(timedelta(seconds=start)) if start == end else None
+
+
+@lru_cache(maxsize=CACHESIZE)
+def parse_time(dts: str) -> datetime | None:
+    "Return datetime for ISO format time stamp, as logged"
+    return _fromisoformat(dts)
+
+
+@lru_cache(maxsize=CACHESIZE)
+def parse_localtime(dts: str) -> datetime | None:
+    "Return naive local datetime for ISO format time stamp"
+    if not (dt := _fromisoformat(dts)):
+        return None
+
+    # Naive time is local but normalise it as astimezone() does. Otherwise
+    # use the local zone for this period, if it does not change within it.
+    if dt.tzinfo is None:
+        zone = None
+    else:
+        zone = _local_zone(int(dt.timestamp()) // ZONEPERIOD)
+
+    return dt.astimezone(zone).replace(tzinfo=None)
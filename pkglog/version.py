@@ -0,0 +1,85 @@
+"Shared helpers for parsers to compare package versions."
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+# Parsers compare the same few version pairs of each package many times
+CACHESIZE = 4096
+
+# Alphabetic and numeric segments, and the tilde and caret separators
+# which sort specially. All other characters just separate segments.
+_SEGMENTS = re.compile(r'~|\^|[0-9]+|[A-Za-z]+')
+
+
+def _rpmvercmp(a: str, b: str) -> int:
+    "Compare two version or release strings in the same way as rpmvercmp()"
+    if a == b:
+        return 0
+
+    segs_a = _SEGMENTS.findall(a)
+    segs_b = _SEGMENTS.findall(b)
+    for num in range(max(len(segs_a), len(segs_b))):
+        x = segs_a[num] if num < len(segs_a) else ''
+        y = segs_b[num] if num < len(segs_b) else ''
+
+        # Tilde sorts before anything, even the end of the version
+        if x == '~' or y == '~':
+            if x != '~':
+                return 1
+            if y != '~':
+                return -1
+            continue
+
+        # Caret sorts after the end of the version, but before anything else
+        if x == '^' or y == '^':
+            if not x:
+                return -1
+            if not y:
+                return 1
+            if x != '^':
+                return 1
+            if y != '^':
+                return -1
+            continue
+
+        # Otherwise the version with more segments is newer
+        if not x or not y:
+            return 1 if x else -1
+
+        # A numeric segment is newer than an alphabetic one
+        if (isnum := x[0].isdigit()) != y[0].isdigit():
+            return 1 if isnum else -1
+
+        if isnum:
+            x = x.lstrip('0')
+            y = y.lstrip('0')
+            if len(x) != len(y):
+                return 1 if len(x) > len(y) else -1
+
+        if x != y:
+            return 1 if x > y else -1
+
+    return 0
+
+
+def _split(evr: str) -> tuple[int, str, str]:
+    "Split [epoch:]version[-release] string to its parts"
+    epoch, _, rest = evr.partition(':') if ':' in evr else ('', '', evr)
+    version, sep, release = rest.rpartition('-')
+    if not sep:
+        version, release = rest, ''
+
+    return int(epoch) if epoch.isdigit() else 0, version, release
+
+
+@lru_cache(maxsize=CACHESIZE)
+def compare(a: str, b: str) -> int:
+    "Return -1, 0, or 1 as RPM style [epoch:]version[-release] a is <, =, > b"
+    epoch_a, version_a, release_a = _split(a)
+    epoch_b, version_b, release_b = _split(b)
+    if epoch_a != epoch_b:
+        return 1 if epoch_a > epoch_b else -1
+
+    return _rpmvercmp(version_a, version_b) or _rpmvercmp(release_a, release_b)
@@ -0,0 +1,46 @@
+"Check the main module imports within the time budget set in the Makefile."
+
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Import is timed this many times, and the fastest compared to the budget.
+# The first run also writes the bytecode of the modules, as when installed.
+RUNS = 4
+
+
+def import_time(module: str) -> int:
+    "Return cumulative time (usecs) to import given module in a new process"
+    env = os.environ.copy()
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    res = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Last line for the module is its top level import, after any nested
+    times = [
+        int(fields[1])
+        for line in res.stderr.splitlines()
+        if len(fields := line.split('|')) == 3 and fields[2] == f' {module}'
+    ]
+    assert times, res.stderr
+    return times[-1]
+
+
+def test_import_time() -> None:
+    makefile = (ROOT / 'Makefile').read_text()
+    budget = re.search(r'^IMPORTBUDGET = (\d+)$', makefile, re.MULTILINE)
+    assert budget
+    usecs = min(import_time('pkglog.pkglog') for _ in range(RUNS))
+    assert usecs <= int(budget[1])
@@ -0,0 +1,106 @@
+"Check installed packages are the same when replayed from cached checkpoints."
+
+from __future__ import annotations
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'bench'))
+
+from genlogs import generate
+
+from pkglog import Log, iter_events, pkglog
+from pkglog import cache as cachemod
+
+LINES = 20000
+
+
+@pytest.fixture
+def logdir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    "Directory of a rotated and current pacman log, with its own cache"
+    monkeypatch.setattr(cachemod, 'CACHEDIR', tmp_path / 'cache')
+    monkeypatch.setattr(pkglog, 'CHECKPOINT', 500)
+    lines = generate(tmp_path / 'gen', 'pacman', LINES).read_text().splitlines(True)
+    path = tmp_path / 'logs'
+    path.mkdir()
+    half = len(lines) // 2
+    (path / 'pacman.log.1').write_text(''.join(lines[:half]))
+    (path / 'pacman.log').write_text(''.join(lines[half:]))
+    return path
+
+
+@pytest.fixture
+def checkpoints(monkeypatch: pytest.MonkeyPatch) -> list:
+    "List of the checkpoint found by each cached query"
+    found = []
+    checkpoint = cachemod.Cache.checkpoint
+
+    def spy(self, paths: list[Path], until: datetime):
+        found.append(result := checkpoint(self, paths, until))
+        return result
+
+    monkeypatch.setattr(cachemod.Cache, 'checkpoint', spy)
+    return found
+
+
+def replay(path: Path, until: datetime) -> list[tuple]:
+    "Return install of each package installed at given time, the slow way"
+    installed: dict[str, datetime] = {}
+    versions: dict[str, str] = {}
+    for dt, action, pkg, vers in iter_events(path, 'pacman'):
+        if dt > until:
+            break
+        if action == 'installed':
+            installed[pkg] = dt
+        elif action == 'removed':
+            installed.pop(pkg, None)
+
+        versions[pkg] = vers.rsplit(' -> ', 1)[-1]
+
+    return sorted((t, 'installed', p, versions[p]) for p, t in installed.items())
+
+
+def installed_at(path: Path, until: datetime, cache: bool) -> list[tuple]:
+    events = Log(path, 'pacman', cache=cache).installed_at(until)
+    assert [e.time for e in events] == sorted(e.time for e in events)
+    return sorted(events)
+
+
+def test_installed_at(logdir: Path) -> None:
+    times = [e.time for e in iter_events(logdir, 'pacman')]
+    for until in (times[0], times[len(times) // 3], times[-2], datetime.max):
+        expected = replay(logdir, until)
+        assert expected
+        assert installed_at(logdir, until, False) == expected
+        assert installed_at(logdir, until, True) == expected
+
+
+def test_checkpoint_append(logdir: Path, checkpoints: list) -> None:
+    current = logdir / 'pacman.log'
+    lines = current.read_text().splitlines(True)
+    tail = len(lines) // 10
+    current.write_text(''.join(lines[:-tail]))
+    assert installed_at(logdir, datetime.max, True) == replay(logdir, datetime.max)
+
+    # Checkpoint from before is still used once the log has been appended to
+    with current.open('a') as fp:
+        fp.write(''.join(lines[-tail:]))
+
+    assert installed_at(logdir, datetime.max, True) == replay(logdir, datetime.max)
+    assert checkpoints[0] is None
+    assert checkpoints[-1] is not None
+
+
+def test_checkpoint_rewrite(logdir: Path, checkpoints: list) -> None:
+    assert installed_at(logdir, datetime.max, True) == replay(logdir, datetime.max)
+
+    # No checkpoint is used once an earlier file has been rewritten
+    rotated = logdir / 'pacman.log.1'
+    lines = rotated.read_text().splitlines(True)
+    rotated.write_text(''.join(lines[: len(lines) // 2]))
+    assert installed_at(logdir, datetime.max, True) == replay(logdir, datetime.max)
+    assert checkpoints == [None, None]
@@ -0,0 +1,91 @@
+"Check changes selected by package name are the same when prefiltered."
+
+from __future__ import annotations
+
+import re
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'bench'))
+
+from genlogs import GENERATORS, generate
+
+from pkglog import iter_events, iter_transactions
+from pkglog.pkglog import compile_select
+
+LINES = 20000
+
+
+@pytest.fixture(scope='module')
+def logdir(tmp_path_factory) -> Path:
+    return tmp_path_factory.mktemp('logs')
+
+
+@pytest.mark.parametrize('parser', sorted(GENERATORS))
+@pytest.mark.parametrize(
+    'options',
+    [{}, {'glob': True}, {'regex': True}, {'jobs': 3}],
+    ids=['names', 'glob', 'regex', 'jobs'],
+)
+def test_filtered_same(logdir: Path, parser: str, options: dict) -> None:
+    path = generate(logdir, parser, LINES)
+    changes = list(iter_events(path, parser))
+    names = sorted({e.package for e in changes})[::50]
+
+    # Patterns are not anchored so the prefilter can be used for them
+    glob = options.get('glob', False)
+    regex = options.get('regex', False)
+    if glob:
+        patterns = [f'?{n[1:-1]}*' for n in names]
+    elif regex:
+        patterns = [re.escape(n[1:-2]) + '.' for n in names]
+    else:
+        patterns = names
+
+    select = compile_select(patterns, (), glob, regex)
+    assert select
+    expected = [e for e in changes if select(e.action, e.package)]
+    assert expected
+    assert list(iter_events(path, parser, packages=patterns, **options)) == expected
+
+
+@pytest.mark.parametrize('parser', sorted(GENERATORS))
+@pytest.mark.parametrize('minutes', [0, 2, 3 * 24 * 60])
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_filtered_groups(logdir: Path, parser: str, minutes: int, jobs: int) -> None:
+    path = generate(logdir, parser, LINES)
+    changes = list(iter_events(path, parser))
+    names = sorted({e.package for e in changes})[::20]
+    timegap = timedelta(minutes=minutes)
+
+    # Without a timegap every line is parsed to yield all ticks
+    expected = list(
+        iter_transactions(
+            iter_events(path, parser, packages=names, ticks=True), timegap
+        )
+    )
+    events = iter_events(
+        path, parser, packages=names, ticks=True, timegap=timegap, jobs=jobs
+    )
+    assert expected
+    assert list(iter_transactions(events, timegap)) == expected
+
+
+def test_filtered_gap(tmp_path: Path) -> None:
+    # Skipped line between changes is still needed to join them
+    path = tmp_path / 'pacman.log'
+    path.write_text(
+        '[2024-01-01T10:00:00+0000] [ALPM] installed aa (1.0)\n'
+        '[2024-01-01T10:01:30+0000] [ALPM] installed other (1.0)\n'
+        '[2024-01-01T10:03:00+0000] [ALPM] installed bbbb (1.0)\n'
+    )
+    timegap = timedelta(minutes=2)
+    for packages in (['aa', 'bbbb'], ['aa'], ['bbbb']):
+        events = iter_events(
+            path, 'pacman', packages=packages, ticks=True, timegap=timegap
+        )
+        assert [len(g) for g in iter_transactions(events, timegap)] == [len(packages)]
@@ -0,0 +1,68 @@
+"Check time stamps convert to local time across daylight saving changes."
+
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from pkglog import timestamp
+from pkglog.timestamp import parse_localtime
+
+
+@pytest.fixture
+def localzone(monkeypatch: pytest.MonkeyPatch):
+    "Set the local time zone to that given, for this test only"
+
+    def setzone(name: str) -> None:
+        monkeypatch.setenv('TZ', name)
+        time.tzset()
+        timestamp._local_zone.cache_clear()
+        parse_localtime.cache_clear()
+
+    yield setzone
+    monkeypatch.undo()
+    time.tzset()
+    timestamp._local_zone.cache_clear()
+    parse_localtime.cache_clear()
+
+
+@pytest.mark.parametrize(
+    ('dts', 'local'),
+    [
+        # Clocks go forward at 01:00 UTC
+        ('2024-03-31T00:59:59+00:00', '2024-03-31 01:59:59'),
+        ('2024-03-31T01:00:00+00:00', '2024-03-31 03:00:00'),
+        ('2024-03-31T03:30:00+02:00', '2024-03-31 03:30:00'),
+        # Clocks go back at 01:00 UTC, so local times repeat
+        ('2024-10-27T00:30:00+00:00', '2024-10-27 02:30:00'),
+        ('2024-10-27T01:30:00+0000', '2024-10-27 02:30:00'),
+        ('2024-10-26T20:30:00-05:00', '2024-10-27 02:30:00'),
+        ('2024-10-27T01:00:00Z', '2024-10-27 02:00:00'),
+        # Naive times are already local, but are normalised as astimezone()
+        # does where they were skipped
+        ('2024-03-31T03:30:00', '2024-03-31 03:30:00'),
+        ('2024-03-31T02:30:00', '2024-03-31 01:30:00'),
+    ],
+)
+def test_localtime_dst(localzone, dts: str, local: str) -> None:
+    localzone('Europe/Berlin')
+    assert parse_localtime(dts) == datetime.fromisoformat(local)
+
+
+@pytest.mark.parametrize(
+    'zone', ['Europe/Berlin', 'America/New_York', 'Australia/Lord_Howe']
+)
+@pytest.mark.parametrize('start', ['2024-03-09T12:00:00', '2024-10-05T12:00:00'])
+def test_localtime_range(localzone, zone: str, start: str) -> None:
+    # Every 7 minutes over a month, which includes a change of each zone
+    localzone(zone)
+    dt = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+    for _ in range(31 * 24 * 60 // 7):
+        for offset in (timedelta(), timedelta(hours=-5, minutes=-30)):
+            logged = dt.astimezone(timezone(offset))
+            expected = dt.astimezone().replace(tzinfo=None)
+            assert parse_localtime(logged.isoformat()) == expected
+
+        dt += timedelta(minutes=7)
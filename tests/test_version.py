@@ -0,0 +1,64 @@
+"Check RPM style versions compare the same as rpmvercmp()."
+
+from __future__ import annotations
+
+import pytest
+
+from pkglog.version import compare
+
+# Each pair of versions, with how the first compares to the second
+VERSIONS = [
+    # Plain numeric segments
+    ('1.0', '1.0', 0),
+    ('1.0', '2.0', -1),
+    ('2.0.1', '2.0', 1),
+    ('5.5p1', '5.5p2', -1),
+    ('5.5p10', '5.5p1', 1),
+    ('10xyz', '10.1xyz', -1),
+    ('xyz10', 'xyz10.1', -1),
+    ('1.0.', '1.0', 0),
+    ('1_0', '1.0', 0),
+    # Epoch
+    ('1:1.0', '2.0', 1),
+    ('2:1.0', '1:9.9', 1),
+    ('0:1.0', '1.0', 0),
+    ('1.0', '1:0.1', -1),
+    # Release
+    ('1.0-1', '1.0-2', -1),
+    ('1.0-10', '1.0-9', 1),
+    ('1.0-2.fc38', '1.0-2.fc39', -1),
+    ('1.1-1', '1.0-9', 1),
+    # Tilde sorts before anything, even the end of the version
+    ('1.0~rc1', '1.0', -1),
+    ('1.0~rc1', '1.0~rc2', -1),
+    ('1.0~rc1~git1', '1.0~rc1', -1),
+    ('1.0~rc1', '1.0~rc1', 0),
+    ('1.0~', '1.0', -1),
+    # Caret sorts after the end of the version, but before anything else
+    ('1.0^', '1.0', 1),
+    ('1.0^git1', '1.0', 1),
+    ('1.0^git1', '1.0.1', -1),
+    ('1.0^git1', '1.0^git2', -1),
+    ('1.0^git1~pre', '1.0^git1', -1),
+    ('1.0~rc1^git1', '1.0~rc1', 1),
+    ('1.0~rc1^git1', '1.0', -1),
+    # Numeric segments are newer than alphabetic ones
+    ('1.a', '1.1', -1),
+    ('2a', '2.0', -1),
+    ('1.0a', '1.0', 1),
+    ('1.b', '1.a', 1),
+    ('1.B', '1.a', -1),
+    # Leading zeros of numeric segments are ignored
+    ('1.01', '1.1', 0),
+    ('1.001', '1.1', 0),
+    ('1.010', '1.10', 0),
+    ('1.002', '1.1', 1),
+    ('1.0010', '1.9', 1),
+    ('20240101', '020240101', 0),
+]
+
+
+@pytest.mark.parametrize(('a', 'b', 'result'), VERSIONS)
+def test_compare(a: str, b: str, result: int) -> None:
+    assert compare(a, b) == result
+    assert compare(b, a) == -result